@@ -0,0 +1,6 @@
+import os
+
+# tests run headless, keep Kivy away from pytest's arguments and quiet
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+os.environ.setdefault("KIVY_NO_FILELOG", "1")
@@ -8,7 +8,13 @@ from utils.CVUtils import (
 )
 from utils.PermissionManager import PermissionManager
 from utils.StatisticsManager import StatisticsManager
-from utils.PulseExtractor import PPGPulseExtractor
+from utils.PulseExtractor import FacePulseExtractor, PPGPulseExtractor, PulseExtractor
+from utils.ProcessingScheduler import ProcessingScheduler
+from utils.SubjectManager import SubjectManager
+from utils.Profiler import Profiler
+from utils.TexturePool import TexturePool
+from utils.AssetManager import AssetManager
+from utils.HistogramService import HistogramService
 from utils.SettingsManager import SettingsManager
 from utils.CVCameraHandler import CVCameraHandler
 from utils.FaceDetector import FaceDetector
@@ -17,7 +23,6 @@ from kivy.core.window import Window
 from kivy.uix.image import Image
 from kivy.clock import Clock
 from kivy.app import App
-import numpy as np
 import time
 import cv2
 
@@ -27,11 +32,8 @@ PREFERRED_WINDOW_SIZE: tuple[int, int] = (606 * 2, 1280 * 2)
 
 class MainApp(App):
     def build(self):
+        AssetManager.iconCachePath = SettingsManager.ICON_CACHE_PATH
         # android permissions
-        self.faceDetector = FaceDetector(
-            SettingsManager.HAARCASCADE_FACE_EXTRACTOR,
-            SettingsManager.PROCESSING_IMAGE_SIZE,
-        )
         self.fingerPulseExtractor = PPGPulseExtractor(
             SettingsManager.PROCESSING_FRAMERATE.value,
             SettingsManager.RECORDING_TIME_SECONDS,
@@ -39,43 +41,122 @@ class MainApp(App):
             SettingsManager.PROCESSING_IMAGE_SIZE,
             (SettingsManager.MIN_HEARTRATE_BPM, SettingsManager.MAX_HEARTRATE_BPM),
             SettingsManager.PPG_BANDPASS_ORDER,
+            SettingsManager.BPM_FREQUENCY_RESOLUTION,
+            SettingsManager.PPG_SAMPLING_COVERAGE,
+            SettingsManager.PPG_SAMPLING_DECIMATION,
+            SettingsManager.PPG_MAX_DARK_FRACTION,
+            SettingsManager.PPG_MAX_CLIPPED_FRACTION,
+        )
+        # one remote PPG extractor per face of the front camera
+        self.subjectManager = SubjectManager(
+            lambda: FacePulseExtractor(
+                SettingsManager.PROCESSING_FRAMERATE.value,
+                SettingsManager.RECORDING_TIME_SECONDS,
+                SettingsManager.PPG_TARGET_CLARITY_THRESHOLD,
+                SettingsManager.PROCESSING_IMAGE_SIZE,
+                (SettingsManager.MIN_HEARTRATE_BPM, SettingsManager.MAX_HEARTRATE_BPM),
+                SettingsManager.PPG_BANDPASS_ORDER,
+                SettingsManager.BPM_FREQUENCY_RESOLUTION,
+                SettingsManager.FACE_PULSE_METHOD,
+                SettingsManager.FACE_PULSE_WINDOW_SECONDS,
+            ),
+            SettingsManager.SUBJECT_MATCH_THRESHOLD,
+            SettingsManager.SUBJECT_MAX_MISSED_UPDATES,
+            SettingsManager.MAX_SUBJECTS,
         )
 
         self.permissionManager = PermissionManager()
         self.permissionManager.requestPermissions()
 
-        self.statisticsManager = StatisticsManager(100)
-        self.faceBoundingBoxes = []
-        self.foreheadBoundingBoxes = []
-        self.cheekBoundingBoxes = []
+        self.profiler = Profiler(SettingsManager.PROFILING_ENABLED)
+        self.statisticsManager = StatisticsManager(100, self.profiler)
+        self.texturePool = TexturePool(self.statisticsManager)
+        self.faceDetector = FaceDetector(
+            SettingsManager.HAARCASCADE_FACE_EXTRACTOR,
+            SettingsManager.PROCESSING_IMAGE_SIZE,
+            SettingsManager.FACE_REDETECTION_INTERVAL,
+            SettingsManager.FACE_TRACKING_THRESHOLD,
+            searchMargin=SettingsManager.FACE_SEARCH_MARGIN,
+            searchScaleTolerance=SettingsManager.FACE_SEARCH_SCALE_TOLERANCE,
+            fullScanInterval=SettingsManager.FACE_FULL_SCAN_INTERVAL,
+            statisticsManager=self.statisticsManager,
+            maxWorkers=SettingsManager.FACE_DETECTION_WORKERS,
+        )
+        self.histogramService = HistogramService(
+            SettingsManager.HISTOGRAM_SUBSAMPLING,
+            SettingsManager.HISTOGRAM_OVERLAY_DIVIDER,
+        )
+        self.processingScheduler = ProcessingScheduler(
+            SettingsManager.PROCESSING_WORKERS
+        )
+        # (face, forehead, cheek) boxes per camera handler id
+        self.faceDetections: dict[int, tuple[list, list, list]] = {}
+        self.fingerPulseState = self.getFingerPulseState()
+        self.subjectStates: list[dict] = []
 
         # app layout
         self.layout = MainLayout()
 
         # my class objects
         self.cvMainCamHandler = CVCameraHandler(
-            0, SettingsManager.RECODRING_IMAGE_SIZE, SettingsManager.PREVIEW_FRAMERATE
+            0,
+            SettingsManager.RECODRING_IMAGE_SIZE,
+            SettingsManager.PREVIEW_FRAMERATE,
+            SettingsManager.CAMERA_THREADED_CAPTURE,
+            SettingsManager.CAMERA_FRAME_RING_SIZE,
         )
         self.cvFrontCamHandler = CVCameraHandler(
-            1, SettingsManager.RECODRING_IMAGE_SIZE, SettingsManager.PREVIEW_FRAMERATE
+            1,
+            SettingsManager.RECODRING_IMAGE_SIZE,
+            SettingsManager.PREVIEW_FRAMERATE,
+            SettingsManager.CAMERA_THREADED_CAPTURE,
+            SettingsManager.CAMERA_FRAME_RING_SIZE,
         )
-        self.statisticsManager._ensureKey('averageFrametime',SettingsManager.PREVIEW_FRAMERATE.value)
+        # time between two previewed frames per camera, averaged over about a second
+        self.lastPreviewTimes: dict[int, float] = {}
+        for cvHandler in (self.cvMainCamHandler, self.cvFrontCamHandler):
+            self.statisticsManager._ensureKey(
+                f"frametime_{id(cvHandler)}", SettingsManager.PREVIEW_FRAMERATE.value
+            )
 
         # update loop
         Clock.schedule_interval(self.update, 0)
 
         Window.size = PREFERRED_WINDOW_SIZE
 
-        self.lastTime = time.time()
         return self.layout
 
+    def on_stop(self):
+        for cvHandler in (self.cvMainCamHandler, self.cvFrontCamHandler):
+            cvHandler.stopCapture()
+        self.processingScheduler.shutdown()
+        self.faceDetector.shutdown()
+        if self.profiler.enabled:
+            self.profiler.exportChromeTrace(SettingsManager.PROFILING_TRACE_PATH)
+
     def update(self, dt):
+        with self.profiler.frame():
+            self.updateCameras()
+
+    def updateCameras(self):
+        dueForProcessing: list[CVCameraHandler] = []
         for cvHandler, cvCanvas in (
             (self.cvMainCamHandler, self.layout.cvMainCamCanvas),
             (self.cvFrontCamHandler, self.layout.cvFrontCamCanvas),
         ):
             # update camera
             if cvHandler.update():
+                self.statisticsManager.addValue(
+                    f"frameAge_{id(cvHandler)}", cvHandler.getFrameAge()
+                )
+                # only ticks with a new frame count, with threaded capture most do not
+                currentTime = time.time()
+                lastPreviewTime = self.lastPreviewTimes.get(id(cvHandler))
+                if lastPreviewTime is not None:
+                    self.statisticsManager.addValue(
+                        f"frametime_{id(cvHandler)}", currentTime - lastPreviewTime
+                    )
+                self.lastPreviewTimes[id(cvHandler)] = currentTime
                 framesToSkip = round(
                     SettingsManager.PREVIEW_FRAMERATE.value
                     / SettingsManager.PROCESSING_FRAMERATE.value
@@ -84,139 +165,267 @@ class MainApp(App):
                 framesSkipped = getattr(self, frameSkipFlag, float("inf"))
 
                 if (framesSkipped >= framesToSkip) or framesToSkip <= 1:
-                    self.processingUpdate(cvHandler)
+                    dueForProcessing.append(cvHandler)
 
                     setattr(self, frameSkipFlag, 0)
 
                 else:
                     setattr(self, frameSkipFlag, framesSkipped + 1)
 
-                self.previewUpdate(cvHandler, cvCanvas)
-            else:
+                with self.profiler.span("previewUpdate"):
+                    self.previewUpdate(cvHandler, cvCanvas)
+            elif not cvHandler.available:
                 # suppres updates if handler not active
                 blockflag = f"block_{id(cvHandler)}_update"
                 if not hasattr(self, blockflag):
                     setattr(self, blockflag, True)
-                    cvCanvas.texture = CVUtils.cvImageToKivyTexture(
-                        self.upscalePreview(CVCameraHandler.NOT_AVAILABLE_IMAGE)
+                    cvCanvas.texture = self.texturePool.upload(
+                        cvCanvas,
+                        self.upscalePreview(CVCameraHandler.NOT_AVAILABLE_IMAGE),
                     )
+                    cvCanvas.canvas.ask_update()
                 # remove camera canvas if unavailable
                 # self.layout.remove_widget(cvCanvas)
-            curentTime = time.time()
-            self.statisticsManager.addValue(
-                "averageFrametime", curentTime - self.lastTime
-            )
-            self.lastTime = curentTime
+
+        if dueForProcessing:
+            self.processingUpdate(dueForProcessing)
 
     def previewUpdate(self, cvHandler: CVCameraHandler, cvCanvas: Image):
         # For every frame that is rendered
 
-        image = CVUtils.putBoundingBoxes(
-            cvHandler.currentFrame, self.foreheadBoundingBoxes + self.cheekBoundingBoxes
-        )
-        self.plotHistograms(image)
-
-        self.fingerPulseExtractor.addFrame(cvHandler.currentFrame, COLOR_FMT.RGB)
-        if self.fingerPulseExtractor.pulseSignalAvailable:
-            self.fingerPulseExtractor.plotPulseWave(image, RGB.MAGENTA)
-            bpmText = f"BPM: {self.fingerPulseExtractor.getBPM():.0f}"
-            cv2.putText(
-                image,
-                bpmText,
-                (image.shape[1] - len(bpmText) * 40, 50),
-                cv2.FONT_HERSHEY_DUPLEX,
-                2,
-                RGB.BLACK.value,
-                thickness=4,
+        profiler = self.profiler
+        with profiler.span("boundingBoxes"):
+            _, foreheadBoundingBoxes, cheekBoundingBoxes = self.faceDetections.get(
+                id(cvHandler), ([], [], [])
             )
+            image = CVUtils.putBoundingBoxes(
+                cvHandler.currentFrame,
+                foreheadBoundingBoxes + cheekBoundingBoxes,
+            )
+        with profiler.span("histograms"):
+            self.plotHistograms(image, cvHandler)
+
+        self.processingScheduler.submit(
+            "fingerPulse",
+            self.extractFingerPulse,
+            self.onFingerPulseExtracted,
+            cvHandler.currentFrame,
+            cvHandler.currentFrameTimestamp,
+        )
+        fingerPulseState = self.fingerPulseState
+        if fingerPulseState["pulseSignalAvailable"]:
+            with profiler.span("pulseWave"):
+                PulseExtractor.putPulseWave(
+                    image, RGB.MAGENTA, *fingerPulseState["pulseWave"]
+                )
+                bpmText = f"BPM: {fingerPulseState['bpm']:.0f}"
+                cv2.putText(
+                    image,
+                    bpmText,
+                    (image.shape[1] - len(bpmText) * 40, 50),
+                    cv2.FONT_HERSHEY_DUPLEX,
+                    2,
+                    RGB.BLACK.value,
+                    thickness=4,
+                )
+        if cvHandler is self.cvFrontCamHandler:
+            with profiler.span("subjects"):
+                self.putSubjects(image)
 
-        preview = self.upscalePreview(image)
-        self.plotFramesPerSecond(preview)
-        self.drawIcons(preview)
+        with profiler.span("upscale"):
+            preview = self.upscalePreview(image)
+        with profiler.span("overlays"):
+            self.plotFramesPerSecond(preview, cvHandler)
+            self.drawIcons(preview)
 
+        # same sized frames are blitted into the canvas' pooled texture
         cvCanvas.texture = self.statisticsManager.run(
-            "imageToTexture", CVUtils.cvImageToKivyTexture, preview
+            "imageToTexture", self.texturePool.upload, cvCanvas, preview
         )
+        cvCanvas.canvas.ask_update()
 
     def upscalePreview(self, image: MatLike) -> MatLike:
+        if SettingsManager.PREVIEW_GPU_SCALING:
+            # uploaded at native size, the Image widget scales it
+            return image
         h, w = image.shape[:2]
         preferredWidth = Window.size[0]
         preferredHeight = int(round(h / w * preferredWidth))
         preview = cv2.resize(image, (preferredWidth, preferredHeight))
         return preview
 
-    def processingUpdate(self, cvHandler: CVCameraHandler):
+    def processingUpdate(self, cvHandlers: list[CVCameraHandler]):
         # For slower processes that may skip frames in between
+        # runs on the processing scheduler as one batch over every due camera,
+        # results arrive in onFacesFound
+
+        self.processingScheduler.submit(
+            "faceDetection",
+            self.findFaces,
+            self.onFacesFound,
+            [cvHandler.currentFrame for cvHandler in cvHandlers],
+            [id(cvHandler) for cvHandler in cvHandlers],
+        )
 
-        face, forehead, cheek = self.findFaces(cvHandler.currentFrame)
-        self.faceBoundingBoxes = face
-        self.foreheadBoundingBoxes = forehead
-        self.cheekBoundingBoxes = cheek
+        # remote PPG on the front camera, per subject at the last known face boxes
+        cvHandler = self.cvFrontCamHandler
+        if cvHandler in cvHandlers:
+            faceBoundingBoxes, _, _ = self.faceDetections.get(id(cvHandler), ([], [], []))
+            self.processingScheduler.submit(
+                "facePulse",
+                self.extractFacePulse,
+                self.onFacePulseExtracted,
+                cvHandler.currentFrame,
+                cvHandler.currentFrameTimestamp,
+                faceBoundingBoxes,
+                id(cvHandler),
+                cvHandler.currentFrameSequence,
+            )
 
-    def findFaces(self, image):
-        faceBoundingBoxes = self.statisticsManager.run(
-            "extractor",
-            self.faceDetector.extractFaceBoundingBoxes,
-            image,
-        )
+    def onFacesFound(self, result: dict):
+        self.faceDetections.update(result)
+
+    def extractFingerPulse(self, frame: MatLike, timestamp: float) -> dict:
+        # worker thread: the extractor is only touched by one "fingerPulse" job at a time
+        with self.profiler.span("fingerPulse"):
+            self.fingerPulseExtractor.addFrame(frame, COLOR_FMT.BGR, timestamp)
+            return self.getFingerPulseState()
+
+    def getFingerPulseState(self) -> dict:
+        extractor = self.fingerPulseExtractor
+        pulseSignalAvailable = extractor.pulseSignalAvailable
+        return {
+            "hasFinger": extractor.hasFinger,
+            "pulseSignalAvailable": pulseSignalAvailable,
+            "requiresRecording": extractor.requiresRecording(),
+            "recordingProgress": extractor.totalRecordingTime
+            / extractor.targetRecordingWindow,
+            "bpm": extractor.getBPM() if pulseSignalAvailable else None,
+            "pulseWave": extractor.getPulseWave() if pulseSignalAvailable else None,
+        }
+
+    def onFingerPulseExtracted(self, state: dict):
+        self.fingerPulseState = state
+
+    def extractFacePulse(
+        self,
+        frame: MatLike,
+        timestamp: float,
+        faceBoundingBoxes: list[tuple[int, int, int, int]],
+        streamId: int,
+        sequence: int,
+    ) -> list[dict]:
+        # worker thread: the subject manager is only touched by one "facePulse" job
+        with self.profiler.span("facePulse"):
+            return self.subjectManager.addFrame(
+                frame, COLOR_FMT.BGR, faceBoundingBoxes, timestamp, streamId, sequence
+            )
 
-        foreheadBoundingBoxes = [
-            FaceDetector.extractForeheadBoundingBox(bb) for bb in faceBoundingBoxes
-        ]
+    def onFacePulseExtracted(self, states: list[dict]):
+        self.subjectStates = states
+
+    def putSubjects(self, image: MatLike):
+        # id and BPM above every visible subject, pulse wave of the first one measured
+        pulseWaveDrawn = False
+        for state in self.subjectStates:
+            if not state["visible"]:
+                continue
+            x, y, _, _ = state["boundingBox"]
+            label = f"#{state['subjectId']}"
+            if state["pulseSignalAvailable"]:
+                label += f" BPM: {state['bpm']:.0f}"
+                if not pulseWaveDrawn:
+                    PulseExtractor.putPulseWave(image, RGB.CYAN, *state["pulseWave"])
+                    pulseWaveDrawn = True
+            cv2.putText(
+                image,
+                label,
+                (x, max(20, y - 10)),
+                cv2.FONT_HERSHEY_DUPLEX,
+                1,
+                RGB.BLACK.value,
+                thickness=2,
+            )
 
-        cheekBoundingBoxes = [
-            FaceDetector.extractCheekBoundingBox(bb) for bb in faceBoundingBoxes
-        ]
-        return faceBoundingBoxes, foreheadBoundingBoxes, cheekBoundingBoxes
+    def findFaces(self, images: list[MatLike], streamIds: list[int]) -> dict:
+        detections = self.statisticsManager.run(
+            "extractor",
+            self.faceDetector.detectFacesBatch,
+            images,
+            streamIds,
+            SettingsManager.FACE_TRACKING_ENABLED,
+        )
 
-    def plotFramesPerSecond(self, image: MatLike):
-        avg = self.statisticsManager.statistics["averageFrametime"].average or float('inf')
-        fpsText = f"FPS: {1 / avg:.0f}"
+        result = {}
+        for detection in detections:
+            faceBoundingBoxes = detection["boxes"]
+            self.statisticsManager.addValue(
+                f"faceDetection_{detection['streamId']}", detection["seconds"]
+            )
+            foreheadBoundingBoxes = [
+                FaceDetector.extractForeheadBoundingBox(bb) for bb in faceBoundingBoxes
+            ]
+
+            cheekBoundingBoxes = [
+                FaceDetector.extractCheekBoundingBox(bb) for bb in faceBoundingBoxes
+            ]
+            result[detection["streamId"]] = (
+                faceBoundingBoxes,
+                foreheadBoundingBoxes,
+                cheekBoundingBoxes,
+            )
+        return result
+
+    def getOverlayScale(self, image: MatLike) -> float:
+        # overlay sizes are given for a preview as wide as the window
+        return image.shape[1] / Window.size[0]
+
+    def plotFramesPerSecond(self, image: MatLike, cvHandler: CVCameraHandler):
+        # previewed frames per second of this camera, frames dropped so far and the age
+        # of the shown frame
+        avg = self.statisticsManager.statistics[f"frametime_{id(cvHandler)}"].average
+        fps = 1 / avg if avg else 0
+        fpsText = (
+            f"FPS: {fps:.0f} dropped: {cvHandler.droppedFramesCount}"
+            f" age: {cvHandler.getFrameAge() * 1000:.0f}ms"
+        )
+        scale = self.getOverlayScale(image)
         cv2.putText(
             image,
             fpsText,
             (5, image.shape[0] - 5),
             cv2.FONT_HERSHEY_DUPLEX,
-            2,
+            2 * scale,
             RGB.BLACK.value,
-            thickness=4,
+            thickness=max(1, round(4 * scale)),
         )
 
-    def plotHistograms(self, image):
-        r, g, b = CVUtils.calcHists(
+    def plotHistograms(self, image: MatLike, cvHandler: CVCameraHandler):
+        # histograms of the camera frame itself, cached per frame sequence. RED, GREEN,
+        # BLUE land in channels 0, 1, 2 of the BGR frame: each curve shows in its colour
+        self.histogramService.putHistograms(
             image,
-            colorFormat=COLOR_FMT.RGB,
+            id(cvHandler),
+            cvHandler.currentFrameSequence,
+            cvHandler.currentFrame,
+            [RGB.RED, RGB.GREEN, RGB.BLUE],
         )
-        maxValue = max(np.max(r), np.max(g), np.max(b))
-        for color, hist in [
-            (RGB.RED, r),
-            (RGB.GREEN, g),
-            (RGB.BLUE, b),
-        ]:
-            CVUtils.plotData(
-                image,
-                hist,
-                color,
-                mutate=True,
-                maxValue=maxValue,
-                plotCenterOfMass=True,
-            )
 
     def drawIcons(self, image: MatLike):
-        d = PREFERRED_ICON_SIZE_PX
+        d = max(1, round(PREFERRED_ICON_SIZE_PX * self.getOverlayScale(image)))
         # draw finger indicator:
+        fingerPulseState = self.fingerPulseState
         fingerIndicatorColor = RGB.GREY
-        if not self.fingerPulseExtractor.hasFinger:
+        if not fingerPulseState["hasFinger"]:
             fingerIndicatorColor = RGB.RED
-        elif self.fingerPulseExtractor.pulseSignalAvailable:
+        elif fingerPulseState["pulseSignalAvailable"]:
             fingerIndicatorColor = RGB.GREEN
-        elif self.fingerPulseExtractor.requiresRecording():
+        elif fingerPulseState["requiresRecording"]:
             fingerIndicatorColor = RGB.BLUE
             CVUtils.putProgressRect(
                 image,
                 (0, 0, d, d),
-                self.fingerPulseExtractor.totalRecordingTime
-                / self.fingerPulseExtractor.targetRecordingWindow,
+                fingerPulseState["recordingProgress"],
                 RGB.GREEN,
             )
 
@@ -229,15 +438,18 @@ class MainApp(App):
             COLOR_FMT.BGRA,
         )
 
-        # draw face indicator
+        # draw face indicator: green once every visible subject has a pulse
         faceIndicatorColor = RGB.GREY
-        if len(self.faceBoundingBoxes) == 1:
-            if self.fingerPulseExtractor.pulseSignalAvailable:
-                faceIndicatorColor = RGB.GREEN
-            else:
-                faceIndicatorColor = RGB.BLUE
-        else:
+        facesCount = sum(len(faces) for faces, _, _ in self.faceDetections.values())
+        visibleSubjects = [state for state in self.subjectStates if state["visible"]]
+        if not facesCount:
             faceIndicatorColor = RGB.RED
+        elif visibleSubjects and all(
+            state["pulseSignalAvailable"] for state in visibleSubjects
+        ):
+            faceIndicatorColor = RGB.GREEN
+        else:
+            faceIndicatorColor = RGB.BLUE
 
         CVUtils.putIcon(
             image,
@@ -247,6 +459,17 @@ class MainApp(App):
             faceIndicatorColor,
             COLOR_FMT.BGRA,
         )
+        if facesCount > 1:
+            scale = self.getOverlayScale(image)
+            cv2.putText(
+                image,
+                str(facesCount),
+                (2 * d, d),
+                cv2.FONT_HERSHEY_DUPLEX,
+                2 * scale,
+                RGB.BLACK.value,
+                thickness=max(1, round(4 * scale)),
+            )
 
 
 def main():
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from scipy import signal as scipySignal
+
+from utils.BandpassFilter import ButterworthBandpass
+
+DESIGNS = [(1, 20, 0.8, 2), (3, 20, 50 / 60, 2), (4, 30, 0.5, 4), (5, 12.5, 0.7, 3.5)]
+
+
+def noisyPulse(fs: float, length: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(length) / fs
+    return 100 + 0.5 * t + np.sin(2 * np.pi * 1.2 * t) + rng.normal(0, 0.3, length)
+
+
+@pytest.mark.parametrize("order, fs, low, high", DESIGNS)
+def test_design_matches_scipy_response(order, fs, low, high):
+    sos = ButterworthBandpass.designSOS(order, fs, low, high)
+    expected = scipySignal.butter(order, [low, high], "bandpass", fs=fs, output="sos")
+    # section order and pairing may differ, the frequency response may not
+    _, response = scipySignal.sosfreqz(sos, 512, fs=fs)
+    _, expectedResponse = scipySignal.sosfreqz(expected, 512, fs=fs)
+    np.testing.assert_allclose(response, expectedResponse, atol=1e-9)
+
+
+@pytest.mark.parametrize("order, fs, low, high", DESIGNS)
+@pytest.mark.parametrize("length", [40, 200, 1000])
+def test_filtfilt_matches_scipy(order, fs, low, high, length):
+    bandpass = ButterworthBandpass(order, fs, low, high)
+    samples = noisyPulse(fs, length)
+    expected = scipySignal.sosfiltfilt(bandpass.sos, samples)
+    np.testing.assert_allclose(bandpass.filtfilt(samples), expected, atol=1e-9)
+
+
+@pytest.mark.parametrize("order, fs, low, high", DESIGNS)
+def test_filter_matches_scipy_from_settled_state(order, fs, low, high):
+    bandpass = ButterworthBandpass(order, fs, low, high)
+    samples = noisyPulse(fs, 300)
+    zi = scipySignal.sosfilt_zi(bandpass.sos) * samples[0]
+    expected, _ = scipySignal.sosfilt(bandpass.sos, samples, zi=zi)
+    np.testing.assert_allclose(bandpass.filter(samples), expected, atol=1e-9)
+
+
+@pytest.mark.parametrize("order, fs, low, high", DESIGNS)
+def test_process_matches_filter(order, fs, low, high):
+    bandpass = ButterworthBandpass(order, fs, low, high)
+    samples = noisyPulse(fs, 300)
+    streamed = [bandpass.process(sample) for sample in samples]
+    np.testing.assert_allclose(streamed, bandpass.filter(samples), atol=1e-12)
+
+
+def test_process_array_matches_process():
+    fs = 20
+    rng = np.random.default_rng(1)
+    # three independent signals, e.g. three pixels of a frame
+    signals = np.stack([noisyPulse(fs, 200, seed) for seed in range(3)], axis=1)
+    gains = rng.uniform(0.5, 2, (1, 3, 2))
+    signals = signals.astype(np.float32).reshape(200, 3, 1) * gains
+    arrayBandpass = ButterworthBandpass(3, fs, 0.8, 2)
+    arrayOutput = np.array([arrayBandpass.processArray(frame) for frame in signals])
+    for index in np.ndindex(signals.shape[1:]):
+        bandpass = ButterworthBandpass(3, fs, 0.8, 2)
+        samples = signals[(slice(None),) + index]
+        expected = [bandpass.process(float(sample)) for sample in samples]
+        np.testing.assert_allclose(
+            arrayOutput[(slice(None),) + index], expected, atol=1e-3 * np.ptp(expected)
+        )
+
+
+def test_invalid_band_raises():
+    with pytest.raises(ValueError):
+        ButterworthBandpass(3, 4, 0.8, 2.5)
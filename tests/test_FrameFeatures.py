@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+from utils.BenchmarkManager import BenchmarkManager
+from utils.CVUtils import COLOR_CHANNEL_FORMAT_ENUM
+from utils.FrameFeatures import FrameFeatureExtractor
+from utils.SettingsManager import SettingsManager
+
+
+def darkFingerFrame(width: int = 640, height: int = 480, seed: int = 0) -> np.ndarray:
+    # finger pressed on the lens without a torch: dim, red-dominant and blurry
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), np.float64)
+    frame[:, :, 0] = 1
+    frame[:, :, 1] = 2
+    frame[:, :, 2] = 14
+    frame += rng.normal(0, 1, frame.shape)
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+    return cv2.GaussianBlur(frame, (15, 15), 0)
+
+
+def test_dark_red_frame_is_a_finger():
+    frame = darkFingerFrame()
+    extractor = BenchmarkManager.createPPGPulseExtractor()
+    extractor.addFrame(frame, COLOR_CHANNEL_FORMAT_ENUM.BGR, 0)
+    # most of the sampled region is below the dark level
+    assert extractor.lastFeatures.darkFraction > 0.5
+    assert extractor.hasFinger
+
+
+def test_sharp_scene_is_not_a_finger():
+    rng = np.random.default_rng(1)
+    frame = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    extractor = BenchmarkManager.createPPGPulseExtractor()
+    extractor.addFrame(frame, COLOR_CHANNEL_FORMAT_ENUM.BGR, 0)
+    assert not extractor.hasFinger
+
+
+def test_sharpness_does_not_depend_on_decimation():
+    frame = BenchmarkManager.generateFingerFrames(
+        1, SettingsManager.RECODRING_IMAGE_SIZE
+    )[0]
+    sharpness = [
+        FrameFeatureExtractor(decimation)
+        .extract(frame, COLOR_CHANNEL_FORMAT_ENUM.BGR)
+        .sharpness
+        for decimation in (1, 2)
+    ]
+    assert sharpness[0] == sharpness[1]
+
+
+def test_decimation_keeps_channel_means():
+    frame = darkFingerFrame()
+    full = FrameFeatureExtractor(1).extract(frame, COLOR_CHANNEL_FORMAT_ENUM.BGR)
+    decimated = FrameFeatureExtractor(2).extract(frame, COLOR_CHANNEL_FORMAT_ENUM.BGR)
+    np.testing.assert_allclose(full.channelMeans, decimated.channelMeans, atol=0.1)
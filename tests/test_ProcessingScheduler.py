@@ -0,0 +1,45 @@
+from utils.ProcessingScheduler import ProcessingScheduler
+import threading
+
+
+def test_instant_jobs_do_not_deadlock():
+    # jobs that finish before their done callback is attached run it in the caller
+    results = []
+    done = threading.Event()
+    scheduler = ProcessingScheduler(2, publish=lambda deliver: deliver())
+
+    def submitAll():
+        for i in range(2000):
+            scheduler.submit("job", lambda value: value, results.append, i)
+        done.set()
+
+    thread = threading.Thread(target=submitAll, daemon=True)
+    thread.start()
+    assert done.wait(10), "submit blocked"
+    scheduler.shutdown(wait=True)
+
+    assert results
+    assert results == sorted(results)
+    assert not scheduler.runningJobs
+
+
+def test_latest_waiting_job_wins():
+    results = []
+    release = threading.Event()
+    finished = threading.Event()
+    scheduler = ProcessingScheduler(1, publish=lambda deliver: deliver())
+
+    def collect(result):
+        results.append(result)
+        if result == "third":
+            finished.set()
+
+    assert scheduler.submit("job", lambda: release.wait(5) and "first", collect)
+    for value in ("second", "third"):
+        assert not scheduler.submit("job", lambda value=value: value, collect)
+    release.set()
+    assert finished.wait(5)
+    scheduler.shutdown(wait=True)
+
+    assert results == ["first", "third"]
+    assert scheduler.droppedCount["job"] == 1
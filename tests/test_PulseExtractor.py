@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from utils.BenchmarkManager import BenchmarkManager
+from utils.PulseExtractor import PulseExtractor
+
+SMALL = PulseExtractor.SMALL_SIGNAL_LENGTH
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return BenchmarkManager.createPPGPulseExtractor()
+
+
+def assertSamePeaks(extractor, signal, threshold, minDistance):
+    expected = extractor._findPeaksLoop(signal, threshold, minDistance)
+    actual = extractor.findPeaks(signal, threshold, minDistance)
+    np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize(
+    "length", [3, 10, 100, SMALL - 1, SMALL, SMALL + 1, SMALL + 2, 2000]
+)
+@pytest.mark.parametrize("minDistance", [1, 2, 5, 7.2, 40])
+@pytest.mark.parametrize("threshold", [0, 0.3, 0.5, 1])
+def test_random_signals_match_loop(extractor, length, minDistance, threshold):
+    rng = np.random.default_rng(length)
+    for _ in range(5):
+        signal = rng.normal(0, 1, length)
+        assertSamePeaks(extractor, signal, threshold, minDistance)
+
+
+@pytest.mark.parametrize("length", [100, SMALL - 1, SMALL + 1, 2000])
+@pytest.mark.parametrize("minDistance", [1, 6, 8.4])
+def test_noisy_pulse_matches_loop(extractor, length, minDistance):
+    rng = np.random.default_rng(0)
+    t = np.arange(length) / 20
+    signal = np.sin(2 * np.pi * 1.2 * t) + rng.normal(0, 0.3, length)
+    assertSamePeaks(extractor, signal, 0.5, minDistance)
+
+
+@pytest.mark.parametrize("length", [SMALL - 1, SMALL + 1])
+def test_plateaus_are_not_peaks(extractor, length):
+    rng = np.random.default_rng(1)
+    # quantized values give runs of equal samples
+    signal = np.round(rng.normal(0, 1, length) * 2) / 2
+    signal[10:14] = signal.max() + 1
+    assertSamePeaks(extractor, signal, 0.5, 3)
+    assert not np.isin(np.arange(10, 14), extractor.findPeaks(signal, 0.5, 3)).any()
+
+
+@pytest.mark.parametrize("length", [SMALL - 1, SMALL + 1])
+def test_edge_samples_are_not_peaks(extractor, length):
+    signal = np.zeros(length)
+    signal[0] = signal[-1] = 10
+    signal[length // 2] = 5
+    assertSamePeaks(extractor, signal, 0.1, 1)
+    np.testing.assert_array_equal(extractor.findPeaks(signal, 0.1, 1), [length // 2])
+
+
+@pytest.mark.parametrize(
+    "signal", [[], [1.0], [1.0, 2.0], [1.0, 2.0, 1.0], [2.0, 2.0, 2.0]]
+)
+def test_short_signals(extractor, signal):
+    actual = extractor.findPeaks(np.array(signal), 0.5, 1)
+    if len(signal) > 0:
+        expected = extractor._findPeaksLoop(np.array(signal), 0.5, 1)
+    else:
+        expected = np.array([])  # the loop cannot take the min of an empty signal
+    np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("length", [SMALL - 1, SMALL + 1])
+def test_constant_signal(extractor, length):
+    signal = np.full(length, 3.0)
+    assertSamePeaks(extractor, signal, 0.5, 1)
+    assert len(extractor.findPeaks(signal, 0.5, 1)) == 0
+
+
+@pytest.mark.parametrize("length", [SMALL - 1, SMALL + 1])
+def test_close_peaks_keep_the_highest(extractor, length):
+    signal = np.zeros(length)
+    signal[[100, 103, 106, 200]] = [1, 3, 2, 1]
+    assertSamePeaks(extractor, signal, 0.1, 5)
+    np.testing.assert_array_equal(extractor.findPeaks(signal, 0.1, 5), [103, 200])
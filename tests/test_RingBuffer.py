@@ -0,0 +1,56 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from utils.RingBuffer import RingBuffer
+
+
+@pytest.mark.parametrize("capacity", [1, 3, 10])
+def test_matches_a_deque(capacity):
+    rng = np.random.default_rng(capacity)
+    buffer = RingBuffer(capacity)
+    expected = deque(maxlen=capacity)
+    for i, value in enumerate(rng.normal(0, 1, 50)):
+        oldest = expected[0] if len(expected) == capacity else None
+        evicted = buffer.append(value, i / 10)
+        expected.append((value, i / 10))
+        assert evicted == oldest
+        assert len(buffer) == len(expected)
+        assert buffer.isFull() == (len(expected) == capacity)
+        np.testing.assert_array_equal(buffer.values, [v for v, _ in expected])
+        np.testing.assert_array_equal(buffer.timestamps, [t for _, t in expected])
+        assert buffer.oldestTimestamp == expected[0][1]
+        assert buffer.latestTimestamp == expected[-1][1]
+        assert buffer.latestValue == expected[-1][0]
+        values = np.array([v for v, _ in expected])
+        assert buffer.std() == pytest.approx(values.std(), abs=1e-12)
+
+
+def test_values_are_views():
+    buffer = RingBuffer(4)
+    for i in range(7):
+        buffer.append(i, i)
+    assert np.shares_memory(buffer.values, buffer._values)
+    assert buffer.values.flags["C_CONTIGUOUS"]
+
+
+def test_shaped_values():
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, (6, 4, 3), dtype=np.uint8)
+    buffer = RingBuffer(3, np.uint8, (4, 3))
+    evicted = [buffer.append(frame, i) for i, frame in enumerate(frames)]
+    np.testing.assert_array_equal(buffer.values, frames[3:])
+    np.testing.assert_array_equal(buffer.latestValue, frames[-1])
+    # the evicted frame is a copy, later appends do not overwrite it
+    np.testing.assert_array_equal(evicted[3][0], frames[0])
+    np.testing.assert_array_equal(evicted[5][0], frames[2])
+
+
+def test_clear_and_empty_std():
+    buffer = RingBuffer(3)
+    assert np.isnan(buffer.std())
+    buffer.append(1.0, 0)
+    buffer.clear()
+    assert len(buffer) == 0
+    assert len(buffer.values) == 0
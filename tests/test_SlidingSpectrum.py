@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from utils.RingBuffer import RingBuffer
+from utils.SlidingSpectrum import SlidingSpectrum
+
+
+def directMagnitudes(values, timestamps, frequencies):
+    # DFT of the mean-removed window evaluated at arbitrary frequencies
+    deviations = values - values.mean()
+    phases = np.outer(2 * np.pi * frequencies, timestamps)
+    return np.abs(np.exp(-1j * phases) @ deviations)
+
+
+def test_window_matches_fft_bins():
+    framerate, windowLength = 20, 100
+    resolution = framerate / windowLength
+    spectrum = SlidingSpectrum(resolution, framerate / 4, resolution)
+    buffer = RingBuffer(windowLength)
+    rng = np.random.default_rng(0)
+    times = np.arange(350) / framerate
+    signal = np.sin(2 * np.pi * 1.2 * times) + rng.normal(0, 0.5, 350)
+    for i, value in enumerate(signal):
+        evicted = buffer.append(value, i / framerate)
+        spectrum.addSample(value, i / framerate, *(evicted or ()))
+
+    window = buffer.values
+    fft = np.abs(np.fft.rfft(window - window.mean()))
+    bins = np.rint(spectrum.frequencies / resolution).astype(int)
+    np.testing.assert_allclose(spectrum.getMagnitudes(), fft[bins], atol=1e-8)
+    assert spectrum.getPeakFrequency() == pytest.approx(1.2)
+
+
+def test_irregular_timestamps_match_direct_dft():
+    rng = np.random.default_rng(1)
+    timestamps = 1000 + np.cumsum(rng.uniform(0.03, 0.08, 300))
+    values = rng.normal(0, 1, 300)
+    spectrum = SlidingSpectrum(0.8, 2, 0.05)
+    buffer = RingBuffer(120)
+    for value, timestamp in zip(values, timestamps):
+        evicted = buffer.append(value, timestamp)
+        spectrum.addSample(value, timestamp, *(evicted or ()))
+    expected = directMagnitudes(buffer.values, buffer.timestamps, spectrum.frequencies)
+    np.testing.assert_allclose(spectrum.getMagnitudes(), expected, atol=1e-8)
+
+
+def test_empty_and_reset():
+    spectrum = SlidingSpectrum(1, 2, 0.5)
+    np.testing.assert_array_equal(spectrum.getMagnitudes(), 0)
+    spectrum.addSample(3.0, 0)
+    spectrum.addSample(1.0, 0.1)
+    spectrum.reset()
+    assert spectrum.count == 0
+    np.testing.assert_array_equal(spectrum.getMagnitudes(), 0)
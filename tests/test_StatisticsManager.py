@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from utils.StatisticsManager import P2Quantile, Statistic
+
+
+@pytest.mark.parametrize("bufferMaxLength", [1, 5, 32])
+def test_window_matches_numpy(bufferMaxLength):
+    rng = np.random.default_rng(bufferMaxLength)
+    values = rng.normal(10, 3, 1000)
+    statistic = Statistic(bufferMaxLength)
+    for i, value in enumerate(values):
+        statistic.newValue(value)
+        window = values[max(0, i + 1 - bufferMaxLength) : i + 1]
+        assert statistic.average == pytest.approx(window.mean(), abs=1e-9)
+        assert statistic.variance == pytest.approx(window.var(), abs=1e-9)
+        assert statistic.minimum == window.min()
+        assert statistic.maximum == window.max()
+
+
+def test_window_min_max_with_repeated_values():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 4, 500).astype(float)
+    statistic = Statistic(7)
+    for i, value in enumerate(values):
+        statistic.newValue(value)
+        window = values[max(0, i - 6) : i + 1]
+        assert statistic.minimum == window.min()
+        assert statistic.maximum == window.max()
+
+
+def test_variance_does_not_drift():
+    # past the periodic exact recompute, with a large offset that hurts rounding
+    rng = np.random.default_rng(1)
+    values = 1e6 + rng.normal(0, 1, 32 * 64 * 3 + 17)
+    statistic = Statistic(32)
+    for value in values:
+        statistic.newValue(value)
+    window = values[-32:]
+    assert statistic.average == pytest.approx(window.mean(), abs=1e-6)
+    assert statistic.variance == pytest.approx(window.var(), rel=1e-6)
+
+
+def test_all_time_values_match_numpy():
+    rng = np.random.default_rng(2)
+    values = rng.exponential(2, 2000)
+    statistic = Statistic(16)
+    for value in values:
+        statistic.newValue(value)
+    assert statistic.count == len(values)
+    assert statistic.lastValue == values[-1]
+    assert statistic.absoluteAverage == pytest.approx(values.mean())
+    assert statistic.absoluteVariance == pytest.approx(values.var())
+    assert statistic.absoluteMinimum == values.min()
+    assert statistic.absoluteMaximum == values.max()
+
+
+@pytest.mark.parametrize("quantile", [0.5, 0.95, 0.99])
+@pytest.mark.parametrize("distribution", ["normal", "uniform", "exponential"])
+def test_p2_quantile_close_to_numpy(quantile, distribution):
+    rng = np.random.default_rng(3)
+    values = getattr(rng, distribution)(size=20000)
+    estimate = P2Quantile(quantile)
+    for value in values:
+        estimate.add(value)
+    # P-square is an estimate, compare in units of the spread of the data
+    assert abs(estimate.value - np.quantile(values, quantile)) < 0.05 * values.std()
+
+
+def test_p2_quantile_exact_before_five_values():
+    estimate = P2Quantile(0.5)
+    assert estimate.value is None
+    for value in [5.0, 1.0, 3.0]:
+        estimate.add(value)
+    assert estimate.value == 3.0
@@ -0,0 +1,141 @@
+from enum import Enum
+import numpy as np
+import threading
+import time
+import os
+import cv2
+
+
+class AssetManager:
+    # Registry of icons, Haar cascades and placeholder images.
+    # Every asset is loaded on first use and exactly once, also when first requested
+    # from several threads. Cascades are the exception: a CascadeClassifier must not
+    # run on two threads at once, so they are loaded once per thread.
+    # Icons can come from a cache file of pre-decoded pixels (see writeIconCache),
+    # entries whose PNG changed since are decoded again.
+
+    iconCachePath: str = None
+
+    _lock = threading.RLock()
+    _icons: dict[Enum, np.ndarray] = {}
+    _cascades: dict[tuple[Enum, int], cv2.CascadeClassifier] = {}
+    _placeholders: dict[tuple[int, int], np.ndarray] = {}
+    _iconCache = None
+    loadTimes: dict[str, float] = {}
+
+    @staticmethod
+    def _timed(name: str, load):
+        startTime = time.perf_counter()
+        asset = load()
+        AssetManager.loadTimes[name] = time.perf_counter() - startTime
+        return asset
+
+    @staticmethod
+    def getIcon(icon: Enum) -> np.ndarray:
+        # BGRA pixels of an ICON_ENUM member
+        image = AssetManager._icons.get(icon)
+        if image is None:
+            with AssetManager._lock:
+                image = AssetManager._icons.get(icon)
+                if image is None:
+                    image = AssetManager._timed(
+                        f"icon_{icon.name}", lambda: AssetManager._loadIcon(icon)
+                    )
+                    AssetManager._icons[icon] = image
+        return image
+
+    @staticmethod
+    def _loadIcon(icon: Enum) -> np.ndarray:
+        cache = AssetManager._getIconCache()
+        if cache is not None and icon.name in cache.files:
+            if cache[f"{icon.name}_mtime"] == os.path.getmtime(icon.value):
+                return cache[icon.name]
+        image = cv2.imread(icon.value, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise FileNotFoundError(f"Icon {icon.value} could not be read")
+        return image
+
+    @staticmethod
+    def _getIconCache():
+        path = AssetManager.iconCachePath
+        if AssetManager._iconCache is None and path and os.path.exists(path):
+            AssetManager._iconCache = np.load(path)
+        return AssetManager._iconCache
+
+    @staticmethod
+    def writeIconCache(icons: list[Enum], path: str):
+        # stores decoded icons (uncompressed npz) with the mtime of their PNG
+        arrays = {}
+        for icon in icons:
+            arrays[icon.name] = cv2.imread(icon.value, cv2.IMREAD_UNCHANGED)
+            arrays[f"{icon.name}_mtime"] = np.float64(os.path.getmtime(icon.value))
+        np.savez(path, **arrays)
+
+    @staticmethod
+    def getCascade(classifier: Enum) -> cv2.CascadeClassifier:
+        # classifier of a HAARCASCADE_ENUM member for the calling thread, the XML is
+        # parsed once per thread
+        key = (classifier, threading.get_ident())
+        cascade = AssetManager._cascades.get(key)
+        if cascade is None:
+            cascade = AssetManager._timed(
+                f"cascade_{classifier.name}",
+                lambda: AssetManager.loadCascade(classifier),
+            )
+            with AssetManager._lock:
+                AssetManager._cascades[key] = cascade
+        return cascade
+
+    @staticmethod
+    def loadCascade(classifier: Enum) -> cv2.CascadeClassifier:
+        # new, unshared classifier, for callers that need one of their own
+        cascade = cv2.CascadeClassifier(classifier.value)
+        if cascade.empty():
+            raise FileNotFoundError(f"Cascade {classifier.value} could not be read")
+        return cascade
+
+    @staticmethod
+    def getPlaceholderImage(resolution: tuple[int, int]) -> np.ndarray:
+        # "Not available" BGRA frame of the given (width, height), shared, do not mutate
+        image = AssetManager._placeholders.get(resolution)
+        if image is None:
+            with AssetManager._lock:
+                image = AssetManager._placeholders.get(resolution)
+                if image is None:
+                    image = np.zeros((resolution[1], resolution[0], 4), np.uint8)
+                    image[:] = (255, 0, 255, 255)
+                    cv2.putText(
+                        image,
+                        "Not available",
+                        (0, resolution[1] // 2),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        1,
+                        (0, 255, 0),
+                    )
+                    AssetManager._placeholders[resolution] = image
+        return image
+
+    @staticmethod
+    def clear():
+        # forgets every loaded asset, the next request loads it again
+        with AssetManager._lock:
+            AssetManager._icons.clear()
+            AssetManager._cascades.clear()
+            AssetManager._placeholders.clear()
+            AssetManager._iconCache = None
+            AssetManager.loadTimes.clear()
+
+
+def main():
+    # python -m utils.AssetManager [path]: writes the pre-decoded icon cache
+    import sys
+    from utils.CVUtils import ICON_ENUM
+    from utils.SettingsManager import SettingsManager
+
+    path = sys.argv[1] if len(sys.argv) > 1 else SettingsManager.ICON_CACHE_PATH
+    AssetManager.writeIconCache(list(ICON_ENUM), path)
+    print(f"Icon cache written to {path}")
+
+
+if __name__ == "__main__":
+    main()
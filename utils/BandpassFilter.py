@@ -0,0 +1,162 @@
+import numpy as np
+
+
+class ButterworthBandpass:
+    # Butterworth bandpass as cascaded second-order sections, designed in pure NumPy.
+    # process() filters one sample at a time and keeps the section states between calls,
+    # costing O(order) per sample. filtfilt() runs the same filter forward and backward
+    # over a whole signal for zero-phase batch analysis.
+
+    def __init__(
+        self,
+        order: int,
+        samplingFrequency: float,
+        lowFrequency: float,
+        highFrequency: float,
+    ):
+        self.order: int = max(1, int(order))
+        self.lowFrequency: float = lowFrequency
+        self.highFrequency: float = highFrequency
+        self.design(samplingFrequency)
+
+    def design(self, samplingFrequency: float):
+        # (re)designs the sections for a new sampling frequency, clears the filter state
+        self.samplingFrequency: float = samplingFrequency
+        self.sos: np.ndarray = ButterworthBandpass.designSOS(
+            self.order, samplingFrequency, self.lowFrequency, self.highFrequency
+        )
+        # plain floats are much faster than NumPy scalars in the per-sample loop
+        self._sections: list[list[float]] = self.sos.tolist()
+        self.reset()
+
+    def reset(self):
+        self._states: list[list[float]] = [[0.0, 0.0] for _ in self._sections]
+        self._offset: float = None
+        # state of processArray, one value per element of the samples
+        self._arrayStates: list[np.ndarray] = None
+        self._arrayOffset: np.ndarray = None
+        self._arrayScratch: np.ndarray = None
+
+    @staticmethod
+    def designSOS(
+        order: int, fs: float, lowFrequency: float, highFrequency: float
+    ) -> np.ndarray:
+        # rows of [b0, b1, b2, a0, a1, a2], same layout as scipy.signal.butter(output="sos")
+        nyquist = fs / 2
+        if not 0 < lowFrequency < highFrequency < nyquist:
+            raise ValueError(
+                f"Band {lowFrequency}-{highFrequency} Hz is not valid for fs={fs} Hz"
+            )
+
+        # analog lowpass prototype poles on the unit circle, left half-plane
+        m = np.arange(-order + 1, order, 2)
+        prototypePoles = -np.exp(1j * np.pi * m / (2 * order))
+
+        # pre-warped band edges for the bilinear transform
+        warpedLow = 2 * fs * np.tan(np.pi * lowFrequency / fs)
+        warpedHigh = 2 * fs * np.tan(np.pi * highFrequency / fs)
+        bandwidth = warpedHigh - warpedLow
+        center = np.sqrt(warpedLow * warpedHigh)
+
+        # lowpass to bandpass: every pole splits in two, order zeros land at s = 0
+        scaledPoles = prototypePoles * bandwidth / 2
+        root = np.sqrt(scaledPoles**2 - center**2)
+        analogPoles = np.concatenate((scaledPoles + root, scaledPoles - root))
+        analogGain = bandwidth**order
+
+        # bilinear transform: s = 0 zeros map to z = 1, the remaining ones to z = -1
+        digitalPoles = (2 * fs + analogPoles) / (2 * fs - analogPoles)
+        digitalGain = analogGain * np.real(
+            (2 * fs) ** order / np.prod(2 * fs - analogPoles)
+        )
+
+        # each section gets one zero at z = 1 and one at z = -1: b = (1, 0, -1)
+        complexPoles = digitalPoles[digitalPoles.imag > 1e-12]
+        realPoles = np.sort(digitalPoles[np.abs(digitalPoles.imag) <= 1e-12].real)
+        sections = []
+        for pole in complexPoles:
+            sections.append([1.0, 0.0, -1.0, 1.0, -2 * pole.real, abs(pole) ** 2])
+        for first, second in zip(realPoles[::2], realPoles[1::2]):
+            sections.append([1.0, 0.0, -1.0, 1.0, -(first + second), first * second])
+
+        sos = np.array(sections)
+        sos[0, :3] *= digitalGain
+        return sos
+
+    def process(self, sample: float) -> float:
+        # the first sample is taken as the resting level, so the filter starts settled
+        if self._offset is None:
+            self._offset = sample
+        value = sample - self._offset
+
+        # transposed direct form II, one section after the other
+        for (b0, b1, b2, _, a1, a2), state in zip(self._sections, self._states):
+            output = b0 * value + state[0]
+            state[0] = b1 * value - a1 * output + state[1]
+            state[1] = b2 * value - a2 * output
+            value = output
+        return value
+
+    def processArray(self, samples: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        # process() for many independent signals at once (e.g. every pixel of a frame),
+        # all of them sampled at the same time, state arrays are kept between calls
+        samples = np.asarray(samples, np.float32)
+        if self._arrayStates is None or self._arrayOffset.shape != samples.shape:
+            self._arrayStates = [
+                np.zeros((2,) + samples.shape, np.float32) for _ in self._sections
+            ]
+            self._arrayOffset = samples.copy()
+            self._arrayScratch = np.empty(samples.shape, np.float32)
+        if out is None:
+            out = np.empty(samples.shape, np.float32)
+
+        value = out
+        np.subtract(samples, self._arrayOffset, out=value)
+        scratch = self._arrayScratch
+        for (b0, b1, b2, _, a1, a2), state in zip(self._sections, self._arrayStates):
+            # output = b0 * value + state[0], the input is only needed for the states
+            np.multiply(value, b0, out=scratch)
+            scratch += state[0]
+            # state[0] = b1 * value - a1 * output + state[1]
+            np.multiply(value, b1, out=state[0])
+            state[0] += state[1]
+            state[0] -= a1 * scratch
+            # state[1] = b2 * value - a2 * output
+            np.multiply(value, b2, out=state[1])
+            state[1] -= a2 * scratch
+            value[...] = scratch
+        return out
+
+    def filter(self, signal: np.ndarray) -> np.ndarray:
+        # causal filtering of a whole signal from a settled state, does not touch self state
+        sections = self._sections
+        output = np.empty(len(signal))
+        if not len(signal):
+            return output
+
+        states = [[0.0, 0.0] for _ in sections]
+        offset = float(signal[0])
+        for i, sample in enumerate(np.asarray(signal, np.float64).tolist()):
+            value = sample - offset
+            for (b0, b1, b2, _, a1, a2), state in zip(sections, states):
+                result = b0 * value + state[0]
+                state[0] = b1 * value - a1 * result + state[1]
+                state[1] = b2 * value - a2 * result
+                value = result
+            output[i] = value
+        return output
+
+    def filtfilt(self, signal: np.ndarray) -> np.ndarray:
+        # zero-phase: forward and backward passes over an odd extension of the edges
+        signal = np.asarray(signal, np.float64)
+        if len(signal) < 2:
+            return np.zeros(len(signal))
+
+        padLength = min(3 * (2 * len(self._sections) + 1), len(signal) - 1)
+        head = 2 * signal[0] - signal[padLength:0:-1]
+        tail = 2 * signal[-1] - signal[-2 : -padLength - 2 : -1]
+        extended = np.concatenate((head, signal, tail))
+
+        forward = self.filter(extended)
+        backward = self.filter(forward[::-1])[::-1]
+        return backward[padLength : padLength + len(signal)]
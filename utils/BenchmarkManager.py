@@ -1,46 +1,808 @@
-from utils.CVUtils import FRAMERATE_ENUM, HAARCASCADE_ENUM, RESOLUTION_ENUM, MatLike
+import os
+
+# benchmarks run headless from the command line, keep Kivy away from their arguments
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+from utils.CVUtils import (
+    COLOR_CHANNEL_FORMAT_ENUM as COLOR_FMT,
+    RGB_COLORS_ENUM as RGB,
+    FRAMERATE_ENUM,
+    HAARCASCADE_ENUM,
+    RESOLUTION_ENUM,
+    ICON_ENUM,
+    CVUtils,
+    MatLike,
+)
 from utils.EncryptionManager import ENCRYPTION_ALGORITHM_ENUM
-from utils.FaceDetector import EMBEDDING_ALGORITHM_ENUM
-from utils.StatisticsManager import StatisticsManager
+from utils.FaceDetector import EMBEDDING_ALGORITHM_ENUM, FaceDetector
+from utils.StatisticsManager import Statistic, StatisticsManager
+from utils.SettingsManager import SettingsManager
+from utils.PulseExtractor import (
+    RPPG_METHOD_ENUM,
+    EVMPulseExtractor,
+    FacePulseExtractor,
+    PPGPulseExtractor,
+    PulseExtractor,
+)
+from utils.AssetManager import AssetManager
+from utils.SubjectManager import SubjectManager
+from utils.HistogramService import HistogramService
+from typing import Callable
+import numpy as np
+import subprocess
+import platform
+import json
+import time
+import sys
+import cv2
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
 
 
 class BenchmarkManager:
-    def __init__(self):
+    # Headless benchmarks: no camera and no Kivy window are needed.
+    # Every run does warm-up iterations first, then up to `iterations` timed calls,
+    # stopping early when timeoutSeconds is reached. Results are plain dicts meant to be
+    # dumped as JSON (see runAll / writeResults) and compared across commits.
+
+    def __init__(self, warmupIterations: int = 5, iterations: int = 100):
         self.statisticsManager = StatisticsManager()
+        self.warmupIterations: int = warmupIterations
+        self.iterations: int = iterations
 
     def runEncryptionBenchmark(
         self,
         algorithm: ENCRYPTION_ALGORITHM_ENUM,
         data: list[float],
         timeoutSeconds: float,
-    ):
-        raise NotImplementedError()
+    ) -> dict:
+        # EncryptionManager has no implementation to measure yet
+        return {"benchmark": "encryption", "skipped": "no algorithm to measure"}
 
     def runClassificationBenchmark(
         self, classifier: HAARCASCADE_ENUM, images: list[MatLike], timeoutSeconds: float
-    ):
-        raise NotImplementedError()
+    ) -> dict:
+        faceDetector = FaceDetector(classifier, SettingsManager.PROCESSING_IMAGE_SIZE)
+        facesFound = []
+
+        def detect(image: MatLike):
+            facesFound.append(len(faceDetector.extractFaceBoundingBoxes(image)))
+
+        result = self._measure(
+            f"classification_{classifier.name}", detect, images, timeoutSeconds
+        )
+        result["classifier"] = classifier.name
+        result["averageFacesFound"] = float(np.mean(facesFound)) if facesFound else 0
+        return result
+
+    def runFaceTrackingBenchmark(
+        self, classifier: HAARCASCADE_ENUM, images: list[MatLike], timeoutSeconds: float
+    ) -> dict:
+        # detect-then-track on a frame sequence, compared box by box to full detection
+        faceDetector = FaceDetector(
+            classifier,
+            SettingsManager.PROCESSING_IMAGE_SIZE,
+            SettingsManager.FACE_REDETECTION_INTERVAL,
+            SettingsManager.FACE_TRACKING_THRESHOLD,
+            searchMargin=SettingsManager.FACE_SEARCH_MARGIN,
+            searchScaleTolerance=SettingsManager.FACE_SEARCH_SCALE_TOLERANCE,
+            fullScanInterval=SettingsManager.FACE_FULL_SCAN_INTERVAL,
+            statisticsManager=self.statisticsManager,
+        )
+        for key in ("facePixelsScanned", "faceScalesEvaluated"):
+            self._resetStatistic(key)
+        tracked = []
+
+        def detect(image: MatLike):
+            tracked.append((image, faceDetector.detectFaces(image)))
+
+        result = self._measure(
+            f"faceTracking_{classifier.name}", detect, images, timeoutSeconds
+        )
+        calls = faceDetector.detectionsCount + faceDetector.trackingCount
+        result["classifier"] = classifier.name
+        result["fullDetectionRate"] = faceDetector.detectionsCount / calls if calls else None
+        # cascade cost per pass, bounded searches included
+        for key, name in (
+            ("facePixelsScanned", "averagePixelsScanned"),
+            ("faceScalesEvaluated", "averageScalesEvaluated"),
+        ):
+            statistic = self.statisticsManager.statistics.get(key)
+            result[name] = statistic.absoluteAverage if statistic else None
+
+        # stability: overlap with a full detection on every 10th frame, outside the timing
+        overlaps = []
+        for image, boxes in tracked[::10]:
+            reference = faceDetector.extractFaceBoundingBoxes(image)
+            if len(boxes) == 1 and len(reference) == 1:
+                overlaps.append(
+                    float(CVUtils.calcIntersectionOverUnion(boxes, reference)[0, 0])
+                )
+        result["averageOverlapWithDetection"] = float(np.mean(overlaps)) if overlaps else None
+
+        fullScan = faceDetector.lastSearchStatistics
+        result["fullScanPixels"] = fullScan.get("pixelsScanned")
+        result["fullScanScales"] = fullScan.get("scalesEvaluated")
+        return result
+
+    def runBatchDetectionBenchmark(
+        self,
+        classifier: HAARCASCADE_ENUM,
+        images: list[MatLike],
+        timeoutSeconds: float,
+        streamsCount: int = 2,
+        maxWorkers: int = SettingsManager.FACE_DETECTION_WORKERS,
+    ) -> dict:
+        # full cascade passes over streamsCount frames per call, batched against serial
+        results = {}
+        for workers in (1, maxWorkers):
+            faceDetector = FaceDetector(
+                classifier, SettingsManager.PROCESSING_IMAGE_SIZE, maxWorkers=workers
+            )
+            streamIds = list(range(streamsCount))
+            frameSeconds = []
+
+            def detect(image: MatLike):
+                detections = faceDetector.detectFacesBatch(
+                    [image] * streamsCount, streamIds, tracking=False
+                )
+                frameSeconds.extend(detection["seconds"] for detection in detections)
+
+            key = f"batchDetection_{classifier.name}_{streamsCount}x{workers}"
+            results[workers] = self._measure(key, detect, images, timeoutSeconds)
+            results[workers]["averageFrameSeconds"] = float(np.mean(frameSeconds))
+            faceDetector.shutdown()
+
+        serial, batched = results[1], results[maxWorkers]
+        batched["streamsCount"] = streamsCount
+        batched["maxWorkers"] = maxWorkers
+        batched["serialLatencySeconds"] = serial["latencySeconds"]
+        batched["speedup"] = (
+            serial["latencySeconds"]["mean"] / batched["latencySeconds"]["mean"]
+        )
+        return batched
 
     def runEmbeddingBenchmark(
         self,
         classifier: EMBEDDING_ALGORITHM_ENUM,
         images: list[MatLike],
         timeoutSeconds: float,
-    ):
-        raise NotImplementedError()
+    ) -> dict:
+        # EMBEDDING_ALGORITHM_ENUM has no algorithms to measure yet
+        return {"benchmark": "embedding", "skipped": "no algorithm to measure"}
 
-    def runPPGBenchmark(self, images: list[MatLike], timeoutSeconds: float):
-        raise NotImplementedError()
+    def runPPGBenchmark(
+        self,
+        images: list[MatLike],
+        timeoutSeconds: float,
+        framerate: float = SettingsManager.PROCESSING_FRAMERATE.value,
+    ) -> dict:
+        # frames are timestamped at the nominal framerate so results do not depend on speed
+        extractor = BenchmarkManager.createPPGPulseExtractor()
+        frameIndex = [0]
+
+        def processFrame(image: MatLike):
+            frameIndex[0] += 1
+            extractor.addFrame(image, COLOR_FMT.BGR, frameIndex[0] / framerate)
+            if extractor.pulseSignalAvailable:
+                extractor.getPulseWave()
+                extractor.getBPM()
+
+        result = self._measure("ppg", processFrame, images, timeoutSeconds)
+        result["hasFinger"] = bool(extractor.hasFinger)
+        result["bpm"] = float(extractor.getBPM()) if len(extractor.sampleBuffer) else None
+        return result
 
     def runEVMBenchmark(
         self,
         freqRange: tuple[float, float],
         images: list[MatLike],
         timeoutSeconds: float,
-    ):
-        raise NotImplementedError()
+        framerate: float = SettingsManager.PROCESSING_FRAMERATE.value,
+        faceBox: tuple[int, int, int, int] = None,
+    ) -> dict:
+        # per-frame cost against the frame budget, frames timestamped at the nominal rate
+        extractor = BenchmarkManager.createEVMPulseExtractor(freqRange)
+        extractor.setSamplingRegions([faceBox] if faceBox else None)
+        frameIndex = [0]
+
+        def processFrame(image: MatLike):
+            frameIndex[0] += 1
+            extractor.addFrame(image, COLOR_FMT.BGR, frameIndex[0] / framerate)
+            if extractor.pulseSignalAvailable:
+                extractor.getPulseWave()
+                extractor.getBPM()
+
+        result = self._measure("evm", processFrame, images, timeoutSeconds)
+        result["frameBudgetSeconds"] = 1 / framerate
+        result["keepsUp"] = result["latencySeconds"].get("p99", 0) < 1 / framerate
+        result["levelShape"] = list(extractor.levelShape)
+        result["memoryBytes"] = extractor.getMemoryUsage()
+        result["bpm"] = float(extractor.getBPM()) if len(extractor.sampleBuffer) else None
+        return result
+
+    def runFacePulseBenchmark(
+        self,
+        images: list[MatLike],
+        timeoutSeconds: float,
+        method: RPPG_METHOD_ENUM = SettingsManager.FACE_PULSE_METHOD,
+        framerate: float = SettingsManager.PROCESSING_FRAMERATE.value,
+        faceBox: tuple[int, int, int, int] = None,
+    ) -> dict:
+        # remote PPG on the forehead and cheek ROIs of one fixed face box
+        height, width = images[0].shape[:2]
+        if faceBox is None:
+            faceBox = (width * 3 // 8, height * 3 // 10, width // 4, height * 2 // 5)
+        extractor = BenchmarkManager.createFacePulseExtractor(method)
+        extractor.setSamplingRegions(
+            [
+                FaceDetector.extractForeheadBoundingBox(faceBox),
+                FaceDetector.extractCheekBoundingBox(faceBox),
+            ]
+        )
+        frameIndex = [0]
+
+        def processFrame(image: MatLike):
+            frameIndex[0] += 1
+            extractor.addFrame(
+                image, COLOR_FMT.BGR, frameIndex[0] / framerate, "facePulse", frameIndex[0]
+            )
+            if extractor.pulseSignalAvailable:
+                extractor.getPulseWave()
+                extractor.getBPM()
+
+        result = self._measure(
+            f"facePulse_{method.name}", processFrame, images, timeoutSeconds
+        )
+        result["frameBudgetSeconds"] = 1 / framerate
+        result["hasFace"] = bool(extractor.hasFace)
+        result["bpm"] = float(extractor.getBPM()) if len(extractor.sampleBuffer) else None
+        return result
+
+    def runSubjectBenchmark(
+        self,
+        images: list[MatLike],
+        timeoutSeconds: float,
+        subjectCounts: list[int] = (1, 2, 4, 6),
+        framerate: float = SettingsManager.PROCESSING_FRAMERATE.value,
+    ) -> dict:
+        # per-frame cost of SubjectManager for growing groups of jittering face boxes
+        height, width = images[0].shape[:2]
+        results = []
+        for subjectCount in subjectCounts:
+            manager = SubjectManager(
+                BenchmarkManager.createFacePulseExtractor,
+                SettingsManager.SUBJECT_MATCH_THRESHOLD,
+                SettingsManager.SUBJECT_MAX_MISSED_UPDATES,
+                max(subjectCount, SettingsManager.MAX_SUBJECTS),
+            )
+            size = width // (subjectCount + 1)
+            frameIndex = [0]
+
+            def processFrame(image: MatLike):
+                frameIndex[0] += 1
+                jitter = frameIndex[0] % 3
+                boxes = [
+                    (i * size + size // 2 + jitter, height // 3 + jitter, size, size)
+                    for i in range(subjectCount)
+                ]
+                manager.addFrame(
+                    image,
+                    COLOR_FMT.BGR,
+                    boxes,
+                    frameIndex[0] / framerate,
+                    "subjects",
+                    frameIndex[0],
+                )
+
+            result = self._measure(
+                f"subjects_{subjectCount}", processFrame, images, timeoutSeconds
+            )
+            result["subjects"] = subjectCount
+            result["subjectIds"] = sorted(manager.subjects)
+            results.append(result)
+        return {"benchmark": "subjects", "results": results}
 
     def runPreviewBenchmark(
-        self, resolution: RESOLUTION_ENUM, framerate: FRAMERATE_ENUM, timeout: float
-    ):
-        raise NotImplementedError()
+        self,
+        resolution: RESOLUTION_ENUM,
+        framerate: FRAMERATE_ENUM,
+        timeout: float,
+        previewWidth: int = 606 * 2,
+        images: list[MatLike] = None,
+        gpuScaling: bool = SettingsManager.PREVIEW_GPU_SCALING,
+    ) -> dict:
+        # CPU side of MainApp.previewUpdate, up to the bytes handed to the texture upload.
+        # With gpuScaling the frame stays native and overlays shrink by native/previewWidth.
+        if images is None:
+            images = BenchmarkManager.generateFingerFrames(
+                framerate.value, resolution, framerate.value
+            )
+
+        height, width = images[0].shape[:2]
+        boundingBoxes = [(width // 4, height // 4, width // 4, height // 8)]
+        signal = BenchmarkManager.generatePulseSignal(
+            SettingsManager.RECORDING_TIME_SECONDS, framerate.value
+        )
+        peakTimes = np.linspace(0, SettingsManager.RECORDING_TIME_SECONDS, 4)
+        peakAmplitudes = np.full(len(peakTimes), np.max(signal))
+
+        histogramService = HistogramService(
+            SettingsManager.HISTOGRAM_SUBSAMPLING,
+            SettingsManager.HISTOGRAM_OVERLAY_DIVIDER,
+        )
+        frameSequence = [0]
+
+        def renderPreview(frame: MatLike):
+            frameSequence[0] += 1
+            image = CVUtils.putBoundingBoxes(frame, boundingBoxes)
+            histogramService.putHistograms(
+                image, 0, frameSequence[0], frame, [RGB.RED, RGB.GREEN, RGB.BLUE]
+            )
+            PulseExtractor.putPulseWave(
+                image,
+                RGB.MAGENTA,
+                signal,
+                peakTimes,
+                peakAmplitudes,
+                SettingsManager.RECORDING_TIME_SECONDS,
+            )
+            if gpuScaling:
+                preview = image
+            else:
+                preview = cv2.resize(
+                    image, (previewWidth, int(round(height / width * previewWidth)))
+                )
+            d = round(100 * preview.shape[1] / previewWidth)
+            CVUtils.putIcon(preview, ICON_ENUM.TOUCH, (0, 0), (d, d), RGB.GREEN, COLOR_FMT.BGRA)
+            CVUtils.putIcon(preview, ICON_ENUM.FACE, (d, 0), (d, d), RGB.RED, COLOR_FMT.BGRA)
+            CVUtils.getTextureBuffer(preview, COLOR_FMT.BGR_AUTO_ALPHA)
+
+        key = f"preview_{resolution.name}_{framerate.name}" + ("_gpu" if gpuScaling else "")
+        result = self._measure(key, renderPreview, images, timeout)
+        frameBudget = 1 / framerate.value
+        latencies = np.array(self.statisticsManager.statistics[key].buffer)
+        result["frameBudgetSeconds"] = frameBudget
+        result["budgetMissRate"] = (
+            float(np.mean(latencies > frameBudget)) if len(latencies) else None
+        )
+        return result
+
+    def _resetStatistic(self, key: str, maxLength: int = None) -> Statistic:
+        # every run starts from a fresh statistic, a repeated key must not report old samples
+        statistic = Statistic(maxLength or self.statisticsManager.bufferMaxLength)
+        self.statisticsManager.statistics[key] = statistic
+        return statistic
+
+    def _measure(
+        self,
+        key: str,
+        func: Callable[[MatLike], None],
+        inputs: list,
+        timeoutSeconds: float,
+    ) -> dict:
+        # warm-up, then fixed iterations over the inputs (cycled) or until the timeout
+        for i in range(self.warmupIterations):
+            func(inputs[i % len(inputs)])
+
+        statistic = self._resetStatistic(key, self.iterations)
+        latencies = np.empty(self.iterations)
+        completed = 0
+        timedOut = False
+        startTime = time.perf_counter()
+        for i in range(self.iterations):
+            if time.perf_counter() - startTime > timeoutSeconds:
+                timedOut = True
+                break
+            callStart = time.perf_counter()
+            func(inputs[i % len(inputs)])
+            latencies[completed] = time.perf_counter() - callStart
+            statistic.newValue(latencies[completed])
+            completed += 1
+        totalTime = time.perf_counter() - startTime
+
+        latencies = latencies[:completed]
+        return {
+            "benchmark": key,
+            "warmupIterations": self.warmupIterations,
+            "iterations": self.iterations,
+            "completedIterations": len(latencies),
+            "timedOut": timedOut,
+            "totalSeconds": totalTime,
+            "throughputPerSecond": len(latencies) / totalTime if totalTime else None,
+            "latencySeconds": BenchmarkManager.summarizeLatencies(latencies),
+            "peakRSSBytes": BenchmarkManager.getPeakRSS(),
+        }
+
+    @staticmethod
+    def summarizeLatencies(latencies: np.ndarray) -> dict:
+        if not len(latencies):
+            return {}
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            "min": float(np.min(latencies)),
+            "mean": float(np.mean(latencies)),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(np.max(latencies)),
+        }
+
+    @staticmethod
+    def getPeakRSS() -> int:
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux/Android, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    @staticmethod
+    def getEnvironment() -> dict:
+        commit = None
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                capture_output=True,
+                text=True,
+                timeout=5,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            pass
+        return {
+            "commit": commit,
+            "timestamp": time.time(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+        }
+
+    def runAll(
+        self, images: list[MatLike] = None, timeoutSeconds: float = 30
+    ) -> dict:
+        # recorded frames are used for every frame benchmark when given, synthetic otherwise
+        fingerFrames = images or BenchmarkManager.generateFingerFrames(
+            100, SettingsManager.RECODRING_IMAGE_SIZE
+        )
+        faceFrames = images or BenchmarkManager.generateFaceFrames(
+            20, SettingsManager.RECODRING_IMAGE_SIZE
+        )
+        facePulseFrames = images or BenchmarkManager.generateFaceFrames(
+            200, SettingsManager.RECODRING_IMAGE_SIZE, bpm=72
+        )
+        return {
+            "environment": BenchmarkManager.getEnvironment(),
+            "results": [
+                self.runClassificationBenchmark(
+                    SettingsManager.HAARCASCADE_FACE_EXTRACTOR, faceFrames, timeoutSeconds
+                ),
+                self.runPPGBenchmark(fingerFrames, timeoutSeconds),
+                self.runEVMBenchmark(
+                    (SettingsManager.MIN_HEARTRATE_BPM, SettingsManager.MAX_HEARTRATE_BPM),
+                    fingerFrames,
+                    timeoutSeconds,
+                ),
+                self.runFacePulseBenchmark(facePulseFrames, timeoutSeconds),
+                self.runSubjectBenchmark(facePulseFrames, timeoutSeconds),
+                self.runPreviewBenchmark(
+                    SettingsManager.RECODRING_IMAGE_SIZE,
+                    SettingsManager.PREVIEW_FRAMERATE,
+                    timeoutSeconds,
+                    images=images,
+                ),
+                self.runFaceTrackingBenchmark(
+                    SettingsManager.HAARCASCADE_FACE_EXTRACTOR, faceFrames, timeoutSeconds
+                ),
+                self.runBatchDetectionBenchmark(
+                    SettingsManager.HAARCASCADE_FACE_EXTRACTOR, faceFrames, timeoutSeconds
+                ),
+                self.runPeakDetectionBenchmark(),
+                self.runStartupBenchmark(),
+            ],
+        }
+
+    @staticmethod
+    def writeResults(results: dict, path: str = None):
+        text = json.dumps(results, indent=4)
+        if path is None:
+            print(text)
+            return
+        with open(path, "w") as file:
+            file.write(text)
+
+    @staticmethod
+    def loadFrames(directory: str) -> list[MatLike]:
+        # recorded frame set: every image in the directory, in file name order
+        names = sorted(os.listdir(directory))
+        frames = [cv2.imread(os.path.join(directory, name)) for name in names]
+        return [frame for frame in frames if frame is not None]
+
+    @staticmethod
+    def generateFingerFrames(
+        count: int,
+        resolution: RESOLUTION_ENUM,
+        framerate: float = SettingsManager.PROCESSING_FRAMERATE.value,
+        bpm: float = 72,
+        seed: int = 0,
+    ) -> list[MatLike]:
+        # finger on the lens: blurry red frame whose green level follows a pulse wave
+        rng = np.random.default_rng(seed)
+        width, height = resolution.value
+        signal = BenchmarkManager.generatePulseSignal(
+            count / framerate, framerate, bpm, seed=seed
+        )
+        frames = []
+        for value in signal[:count]:
+            frame = np.empty((height, width, 3), np.uint8)
+            frame[:, :, 0] = 40
+            frame[:, :, 1] = np.clip(value - 60, 0, 255)
+            frame[:, :, 2] = 220
+            noise = rng.normal(0, 1, (height, width, 3))
+            frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+            frames.append(cv2.GaussianBlur(frame, (9, 9), 0))
+        return frames
+
+    @staticmethod
+    def generateFaceFrames(
+        count: int,
+        resolution: RESOLUTION_ENUM,
+        seed: int = 0,
+        bpm: float = None,
+        framerate: float = SettingsManager.PROCESSING_FRAMERATE.value,
+    ) -> list[MatLike]:
+        # textured background with a face-like blob, for detector latency. With a bpm the
+        # skin colour pulses like a blood volume signal (strongest in green) under a
+        # slowly drifting illumination
+        rng = np.random.default_rng(seed)
+        width, height = resolution.value
+        skin = np.array((140, 170, 210), np.float64)
+        pulse = np.zeros(count)
+        if bpm is not None:
+            pulse = BenchmarkManager.generatePulseSignal(
+                count / framerate, framerate, bpm, noise=0, seed=seed
+            )
+            pulse = (pulse - pulse.mean()) / (pulse.std() or 1)
+        frames = []
+        for i in range(count):
+            frame = rng.integers(0, 256, (height, width, 3), np.uint8)
+            center = (width // 2 + i % 7, height // 2 + i % 5)
+            axes = (width // 8, height // 5)
+            color = skin
+            if bpm is not None:
+                illumination = 1 + 0.05 * np.sin(2 * np.pi * 0.2 * i / framerate)
+                color = skin * illumination * (1 + 0.01 * pulse[i] * np.array((0.5, 1, 0.3)))
+            cv2.ellipse(
+                frame, center, axes, 0, 0, 360, tuple(color.tolist()), cv2.FILLED
+            )
+            for dx in (-axes[0] // 2, axes[0] // 2):
+                eye = (center[0] + dx, center[1] - axes[1] // 4)
+                cv2.circle(frame, eye, axes[0] // 6, (40, 40, 40), cv2.FILLED)
+            frames.append(frame)
+        return frames
+
+    @staticmethod
+    def createPPGPulseExtractor() -> PPGPulseExtractor:
+        return PPGPulseExtractor(
+            SettingsManager.PROCESSING_FRAMERATE.value,
+            SettingsManager.RECORDING_TIME_SECONDS,
+            SettingsManager.PPG_TARGET_CLARITY_THRESHOLD,
+            SettingsManager.PROCESSING_IMAGE_SIZE,
+            (SettingsManager.MIN_HEARTRATE_BPM, SettingsManager.MAX_HEARTRATE_BPM),
+            SettingsManager.PPG_BANDPASS_ORDER,
+            SettingsManager.BPM_FREQUENCY_RESOLUTION,
+            SettingsManager.PPG_SAMPLING_COVERAGE,
+            SettingsManager.PPG_SAMPLING_DECIMATION,
+            SettingsManager.PPG_MAX_DARK_FRACTION,
+            SettingsManager.PPG_MAX_CLIPPED_FRACTION,
+        )
+
+    @staticmethod
+    def createEVMPulseExtractor(
+        freqRange: tuple[float, float] = (
+            SettingsManager.MIN_HEARTRATE_BPM,
+            SettingsManager.MAX_HEARTRATE_BPM,
+        ),
+    ) -> EVMPulseExtractor:
+        return EVMPulseExtractor(
+            SettingsManager.PROCESSING_FRAMERATE.value,
+            SettingsManager.RECORDING_TIME_SECONDS,
+            SettingsManager.PPG_TARGET_CLARITY_THRESHOLD,
+            SettingsManager.PROCESSING_IMAGE_SIZE,
+            freqRange,
+            SettingsManager.PPG_BANDPASS_ORDER,
+            SettingsManager.BPM_FREQUENCY_RESOLUTION,
+            SettingsManager.PPG_SAMPLING_COVERAGE,
+            SettingsManager.EVM_PYRAMID_LEVELS,
+            SettingsManager.EVM_ROI_SIZE,
+        )
+
+    @staticmethod
+    def createFacePulseExtractor(
+        method: RPPG_METHOD_ENUM = SettingsManager.FACE_PULSE_METHOD,
+    ) -> FacePulseExtractor:
+        return FacePulseExtractor(
+            SettingsManager.PROCESSING_FRAMERATE.value,
+            SettingsManager.RECORDING_TIME_SECONDS,
+            SettingsManager.PPG_TARGET_CLARITY_THRESHOLD,
+            SettingsManager.PROCESSING_IMAGE_SIZE,
+            (SettingsManager.MIN_HEARTRATE_BPM, SettingsManager.MAX_HEARTRATE_BPM),
+            SettingsManager.PPG_BANDPASS_ORDER,
+            SettingsManager.BPM_FREQUENCY_RESOLUTION,
+            method,
+            SettingsManager.FACE_PULSE_WINDOW_SECONDS,
+        )
+
+    def runStartupBenchmark(
+        self,
+        modules: list[str] = None,
+        repeats: int = 5,
+        iconCachePath: str = SettingsManager.ICON_CACHE_PATH,
+    ) -> dict:
+        # cold import of each module in a fresh interpreter, then first use of every asset
+        if modules is None:
+            modules = [
+                "utils.CVUtils",
+                "utils.FaceDetector",
+                "utils.CVCameraHandler",
+                "utils.PulseExtractor",
+            ]
+        rootDirectory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        environment = dict(os.environ, KIVY_NO_ARGS="1", KIVY_NO_CONSOLELOG="1")
+
+        imports = []
+        for module in modules:
+            script = (
+                "import time; startTime = time.perf_counter(); "
+                f"import {module}; print(time.perf_counter() - startTime)"
+            )
+            key = f"import_{module}"
+            self._resetStatistic(key, repeats)
+            for _ in range(repeats):
+                output = subprocess.run(
+                    [sys.executable, "-c", script],
+                    cwd=rootDirectory,
+                    env=environment,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                ).stdout
+                self.statisticsManager.addValue(key, float(output.split()[-1]))
+            statistic = self.statisticsManager.statistics[key]
+            imports.append(
+                {
+                    "module": module,
+                    "minSeconds": statistic.minimum,
+                    "averageSeconds": statistic.average,
+                }
+            )
+
+        firstUse = {}
+        for cachePath in (None, iconCachePath):
+            if cachePath is not None and not os.path.exists(cachePath):
+                continue
+            AssetManager.clear()
+            AssetManager.iconCachePath = cachePath
+            for icon in ICON_ENUM:
+                AssetManager.getIcon(icon)
+            AssetManager.getCascade(SettingsManager.HAARCASCADE_FACE_EXTRACTOR)
+            firstUse["iconCache" if cachePath else "decoded"] = dict(
+                AssetManager.loadTimes
+            )
+        AssetManager.clear()
+        AssetManager.iconCachePath = None
+
+        return {
+            "benchmark": "startup",
+            "repeats": repeats,
+            "imports": imports,
+            "firstUseSeconds": firstUse,
+        }
+
+    def runPeakDetectionBenchmark(
+        self,
+        signals: list[tuple[np.ndarray, float]] = None,
+        iterations: int = 20,
+    ) -> dict:
+        # compares PulseExtractor.findPeaks against the per-sample reference loop on
+        # (signal, framerate) pairs, the first default one is the configured window
+        if signals is None:
+            signals = [
+                (
+                    BenchmarkManager.generatePulseSignal(durationSeconds, framerate, seed=i),
+                    framerate,
+                )
+                for i, (durationSeconds, framerate) in enumerate(
+                    [
+                        (
+                            SettingsManager.RECORDING_TIME_SECONDS,
+                            SettingsManager.PROCESSING_FRAMERATE.value,
+                        ),
+                        (10, 30),
+                        (60, 30),
+                        (60, 60),
+                    ]
+                )
+            ]
+
+        results = []
+        for signal, framerate in signals:
+            # the minimum peak distance the extractor itself uses at this framerate
+            extractor = BenchmarkManager.createPPGPulseExtractor()
+            for i, sample in enumerate(signal[: extractor.expectedFramesCount].tolist()):
+                extractor.addSample(sample, i / framerate)
+            minDistance = extractor.minRRIntervalSamples
+
+            expected = extractor._findPeaksLoop(signal, 0.5, minDistance)
+            actual = extractor.findPeaks(signal, 0.5, minDistance)
+
+            loopKey = f"findPeaksLoop_{len(signal)}"
+            vectorizedKey = f"findPeaks_{len(signal)}"
+            self._resetStatistic(loopKey, iterations)
+            self._resetStatistic(vectorizedKey, iterations)
+            for _ in range(iterations):
+                self.statisticsManager.run(
+                    loopKey, extractor._findPeaksLoop, signal, 0.5, minDistance
+                )
+                self.statisticsManager.run(
+                    vectorizedKey, extractor.findPeaks, signal, 0.5, minDistance
+                )
+
+            loopTime = self.statisticsManager.statistics[loopKey].average
+            vectorizedTime = self.statisticsManager.statistics[vectorizedKey].average
+            results.append(
+                {
+                    "samples": len(signal),
+                    "minDistance": minDistance,
+                    "peaks": len(actual),
+                    "matches": bool(np.array_equal(expected, actual)),
+                    "loopSeconds": loopTime,
+                    "vectorizedSeconds": vectorizedTime,
+                    "speedup": loopTime / vectorizedTime,
+                }
+            )
+        return {"benchmark": "peakDetection", "iterations": iterations, "results": results}
+
+    @staticmethod
+    def generatePulseSignal(
+        durationSeconds: float,
+        framerate: float,
+        bpm: float = 72,
+        noise: float = 0.2,
+        seed: int = 0,
+    ) -> np.ndarray:
+        # PPG-like waveform: fundamental plus a dicrotic harmonic, baseline drift and noise
+        rng = np.random.default_rng(seed)
+        t = np.arange(int(durationSeconds * framerate)) / framerate
+        phase = 2 * np.pi * bpm / 60 * t
+        signal = (
+            np.sin(phase)
+            + 0.4 * np.sin(2 * phase + 0.8)
+            + 0.3 * np.sin(2 * np.pi * 0.1 * t)
+            + rng.normal(0, noise, len(t))
+        )
+        return 120 + 5 * signal
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the headless benchmark suite.")
+    parser.add_argument("--frames", help="directory of recorded frames", default=None)
+    parser.add_argument("--output", help="JSON output path, stdout if omitted")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    images = BenchmarkManager.loadFrames(args.frames) if args.frames else None
+    benchmarkManager = BenchmarkManager(args.warmup, args.iterations)
+    BenchmarkManager.writeResults(
+        benchmarkManager.runAll(images, args.timeout), args.output
+    )
+
+
+if __name__ == "__main__":
+    main()
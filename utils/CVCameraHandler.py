@@ -1,21 +1,25 @@
 from utils.CVUtils import (
     FRAMERATE_ENUM,
     RESOLUTION_ENUM,
-    CVUtils
+    MatLike,
 )
-import numpy as np
+from utils.AssetManager import AssetManager
+from collections import deque
+import threading
+import time
 import cv2
 
 
 class CVCameraHandler:
     NOT_AVAILABLE_IMAGE = None
-    NOT_AVAILABLE_TEXTURE = None
 
     def __init__(
         self,
         cameraIndex: int,
         recordingResolution: RESOLUTION_ENUM,
         recordingFramerate: FRAMERATE_ENUM,
+        threadedCapture: bool = False,
+        frameRingSize: int = 2,
     ):
         self.cvCapture = cv2.VideoCapture(cameraIndex)
         self.recordingResolution = recordingResolution.value
@@ -27,23 +31,30 @@ class CVCameraHandler:
         self.cvCapture.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0)
         self.cvCapture.set(cv2.CAP_PROP_AUTOFOCUS, 1)
 
-        CVCameraHandler.NOT_AVAILABLE_IMAGE = np.zeros(
-            (self.recordingResolution[1], self.recordingResolution[0], 4), np.uint8
-        )
-        CVCameraHandler.NOT_AVAILABLE_IMAGE[:] = (255, 0, 255, 255)
-        cv2.putText(
-            CVCameraHandler.NOT_AVAILABLE_IMAGE,
-            "Not available",
-            (0, self.recordingResolution[1] // 2),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            (0, 255, 0),
-        )
-        CVCameraHandler.NOT_AVAILABLE_TEXTURE = CVUtils.cvImageToKivyTexture(
-            CVCameraHandler.NOT_AVAILABLE_IMAGE
+        # built once per resolution and shared by every handler
+        CVCameraHandler.NOT_AVAILABLE_IMAGE = AssetManager.getPlaceholderImage(
+            self.recordingResolution
         )
 
         self.currentFrame = CVCameraHandler.NOT_AVAILABLE_IMAGE
+        self.available = False
+
+        # frame bookkeeping, sequence numbers start at 1 for the first captured frame
+        self.currentFrameSequence: int = 0
+        self.currentFrameTimestamp: float = 0
+        self.capturedFramesCount: int = 0
+        self.droppedFramesCount: int = 0
+
+        # background capture: reader thread fills a drop-oldest ring
+        self.threadedCapture = threadedCapture
+        self.frameRing: deque[tuple[int, float, MatLike]] = deque(
+            maxlen=max(1, frameRingSize)
+        )
+        self.frameRingLock = threading.Lock()
+        self.captureThread: threading.Thread = None
+        self.captureRunning = False
+        if self.threadedCapture:
+            self.startCapture()
 
     def getCapProps(self, capProps: list) -> dict:
         result = {}
@@ -52,9 +63,15 @@ class CVCameraHandler:
         return result
 
     def update(self) -> bool:
+        if self.threadedCapture:
+            return self._updateFromRing()
+
         # load image from cam
         available, frame = self.cvCapture.read()
         self.available = available
+        if available:
+            self._acceptFrame(self.capturedFramesCount + 1, time.time())
+            self.capturedFramesCount += 1
 
         self.currentFrame = (
             frame
@@ -65,6 +82,64 @@ class CVCameraHandler:
 
         return self.available
 
+    def _updateFromRing(self) -> bool:
+        # never blocks: take the newest captured frame, if any arrived since last update
+        with self.frameRingLock:
+            newest = self.frameRing.pop() if self.frameRing else None
+            self.frameRing.clear()
+
+        if newest is None:
+            return False
+
+        sequence, timestamp, frame = newest
+        self._acceptFrame(sequence, timestamp)
+        self.currentFrame = frame
+        return True
+
+    def _acceptFrame(self, sequence: int, timestamp: float):
+        # frames skipped between two consumed sequence numbers count as dropped
+        if self.currentFrameSequence:
+            self.droppedFramesCount += max(0, sequence - self.currentFrameSequence - 1)
+        self.currentFrameSequence = sequence
+        self.currentFrameTimestamp = timestamp
+
+    def _captureLoop(self):
+        while self.captureRunning:
+            available, frame = self.cvCapture.read()
+            timestamp = time.time()
+            self.available = available
+            if not available:
+                # camera missing or stalled, avoid spinning on a dead capture
+                time.sleep(1 / self.recordingFramerate)
+                continue
+
+            with self.frameRingLock:
+                self.capturedFramesCount += 1
+                self.frameRing.append((self.capturedFramesCount, timestamp, frame))
+
+    def startCapture(self):
+        if self.captureThread is not None and self.captureThread.is_alive():
+            return
+        self.captureRunning = True
+        self.captureThread = threading.Thread(
+            target=self._captureLoop,
+            name=f"CVCameraHandler-{id(self)}",
+            daemon=True,
+        )
+        self.captureThread.start()
+
+    def stopCapture(self, timeoutSeconds: float = 1):
+        self.captureRunning = False
+        if self.captureThread is not None:
+            self.captureThread.join(timeoutSeconds)
+            self.captureThread = None
+
+    def getFrameAge(self) -> float:
+        # seconds since the current frame was captured
+        if not self.currentFrameSequence:
+            return float("inf")
+        return time.time() - self.currentFrameTimestamp
+
 
     def increaseExposure(self):
         currentExposure = self.cvCapture.get(cv2.CAP_PROP_GAIN)
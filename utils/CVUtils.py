@@ -1,5 +1,5 @@
+from utils.AssetManager import AssetManager
 from kivy.graphics.texture import Texture
-from abc import ABC as AbstractClass
 from enum import Enum
 import numpy as np
 import cv2
@@ -30,8 +30,9 @@ class COLOR_CHANNEL_FORMAT_ENUM(Enum):
     RGBA: str = "rgba"
     BGR: str = "bgr"
     BGRA: str = "bgra"
-    RGB_AUTO_ALPHA = None
-    BGR_AUTO_ALPHA = None
+    # distinct values, equal values would make BGR_AUTO_ALPHA an alias of RGB_AUTO_ALPHA
+    RGB_AUTO_ALPHA: str = "rgb_auto_alpha"
+    BGR_AUTO_ALPHA: str = "bgr_auto_alpha"
 
 
 class COLOR_CHANNEL_FORMAT_GROUPS_ENUM(Enum):
@@ -73,11 +74,11 @@ class RGB_COLORS_ENUM(Enum):
     GREY = (128, 128, 128)
 
 
-class ICON_ENUM(AbstractClass):
-    # PNGs of size 512x512
-    NO_TOUCH = cv2.imread("assets/images/no-touch.png", cv2.IMREAD_UNCHANGED)
-    TOUCH = cv2.imread("assets/images/touch.png", cv2.IMREAD_UNCHANGED)
-    FACE = cv2.imread("assets/images/face.png", cv2.IMREAD_UNCHANGED)
+class ICON_ENUM(Enum):
+    # PNGs of size 512x512, loaded on first use by AssetManager.getIcon
+    NO_TOUCH = "assets/images/no-touch.png"
+    TOUCH = "assets/images/touch.png"
+    FACE = "assets/images/face.png"
 
 
 class CVUtils:
@@ -96,7 +97,7 @@ class CVUtils:
     @staticmethod
     def cropToRect(image: MatLike, rect: tuple[int, int, int, int]) -> MatLike:
         x, y, w, h = rect
-        return image[x : x + w, y : y + h]
+        return image[y : y + h, x : x + w]
 
     @staticmethod
     def calcHists(
@@ -118,107 +119,154 @@ class CVUtils:
         ]
         return hists
 
+    @staticmethod
+    def resolveChannelFormat(
+        cvImage: MatLike, colorFormat: COLOR_CHANNEL_FORMAT_ENUM
+    ) -> COLOR_CHANNEL_FORMAT_ENUM:
+        # auto alpha formats resolve to the concrete format by the image channel count
+        if colorFormat not in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.AUTO_ALPHA.value:
+            return colorFormat
+        imageColorChannelCount = cvImage.shape[2]
+        isRGB = colorFormat is COLOR_CHANNEL_FORMAT_ENUM.RGB_AUTO_ALPHA
+        if imageColorChannelCount == 3:
+            return COLOR_CHANNEL_FORMAT_ENUM.RGB if isRGB else COLOR_CHANNEL_FORMAT_ENUM.BGR
+        if imageColorChannelCount == 4:
+            return COLOR_CHANNEL_FORMAT_ENUM.RGBA if isRGB else COLOR_CHANNEL_FORMAT_ENUM.BGRA
+        raise Exception("Invalid color channel count for opencv image.")
+
+    @staticmethod
+    def getConversionCode(
+        inputFormat: COLOR_CHANNEL_FORMAT_ENUM, outputFormat: COLOR_CHANNEL_FORMAT_ENUM
+    ) -> int:
+        # cv2.COLOR_* code between two concrete formats, None when they are the same
+        if inputFormat == outputFormat:
+            return None
+        return getattr(
+            cv2, f"COLOR_{inputFormat.value.upper()}2{outputFormat.value.upper()}"
+        )
+
     @staticmethod
     def convertChannelFormat(
         cvImage: MatLike,
         inputFormat: COLOR_CHANNEL_FORMAT_ENUM,
         outputFormat: COLOR_CHANNEL_FORMAT_ENUM,
+        dst: MatLike = None,
     ) -> MatLike:
-        # does not mutate original image
-        image = np.copy(cvImage)
-
-        if inputFormat in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.AUTO_ALPHA.value:
-            imageColorChannelCount = image.shape[2]
-            if imageColorChannelCount == 3:
-                if inputFormat == COLOR_CHANNEL_FORMAT_ENUM.RGB_AUTO_ALPHA:
-                    inputFormat = COLOR_CHANNEL_FORMAT_ENUM.RGB
-                if inputFormat == COLOR_CHANNEL_FORMAT_ENUM.BGR_AUTO_ALPHA:
-                    inputFormat = COLOR_CHANNEL_FORMAT_ENUM.BGR
-            elif imageColorChannelCount == 4:
-                if inputFormat == COLOR_CHANNEL_FORMAT_ENUM.RGB_AUTO_ALPHA:
-                    inputFormat = COLOR_CHANNEL_FORMAT_ENUM.RGBA
-                if inputFormat == COLOR_CHANNEL_FORMAT_ENUM.BGR_AUTO_ALPHA:
-                    inputFormat = COLOR_CHANNEL_FORMAT_ENUM.BGRA
-            else:
-                raise Exception("Invalid color channel count for opencv image.")
+        # does not mutate original image, a single cv2.cvtColor (into dst when given)
+        inputFormat = CVUtils.resolveChannelFormat(cvImage, inputFormat)
+        code = CVUtils.getConversionCode(inputFormat, outputFormat)
+        if code is None:
+            if dst is None:
+                return np.copy(cvImage)
+            dst[:] = cvImage
+            return dst
+        return cv2.cvtColor(cvImage, code, dst=dst)
+
+    # upload formats the GL driver takes natively, filled on first use. Formats Kivy only
+    # accepts by converting in software count as unsupported, we convert into a pooled
+    # buffer instead of letting Kivy allocate one per frame
+    _textureFormatSupport: dict[str, bool] = {}
+    # destination buffers for channel conversions before upload, by shape
+    _conversionBuffers: dict[tuple, MatLike] = {}
 
-        if (
-            inputFormat in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.NON_ALPHA.value
-            and outputFormat in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.WITH_ALPHA.value
-        ):
-            # convert image with no alpha to image with alpha by adding a full alpha channel
-            emptyImageChannelMatrix = np.full(
-                (image.shape[0], image.shape[1], 1), 255, np.uint8
-            )
-            image = np.append(
-                image,
-                emptyImageChannelMatrix,
-                axis=2,
+    @staticmethod
+    def isTextureFormatSupported(colorFormat: COLOR_CHANNEL_FORMAT_ENUM) -> bool:
+        supported = CVUtils._textureFormatSupport.get(colorFormat.value)
+        if supported is None:
+            from kivy.graphics.opengl_utils import gl_has_texture_native_format
+
+            supported = bool(gl_has_texture_native_format(colorFormat.value))
+            CVUtils._textureFormatSupport[colorFormat.value] = supported
+        return supported
+
+    @staticmethod
+    def getUploadFormat(
+        cvImage: MatLike,
+        inputChannelFormat: COLOR_CHANNEL_FORMAT_ENUM = COLOR_CHANNEL_FORMAT_ENUM.BGR_AUTO_ALPHA,
+        outputChannelFormat: COLOR_CHANNEL_FORMAT_ENUM = None,
+    ) -> COLOR_CHANNEL_FORMAT_ENUM:
+        # the image's own channel order unless the driver lacks it, then rgb(a)
+        uploadFormat = outputChannelFormat or CVUtils.resolveChannelFormat(
+            cvImage, inputChannelFormat
+        )
+        if not CVUtils.isTextureFormatSupported(uploadFormat):
+            uploadFormat = (
+                COLOR_CHANNEL_FORMAT_ENUM.RGBA
+                if uploadFormat in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.WITH_ALPHA.value
+                else COLOR_CHANNEL_FORMAT_ENUM.RGB
             )
-            pass
-        elif (
-            inputFormat in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.WITH_ALPHA.value
-            and outputFormat in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.NON_ALPHA.value
-        ):
-            image = image[:, :, :-1]
-        else:
-            pass  # nothing to add/remove
+        return uploadFormat
 
-        if (
-            inputFormat
-            in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.RGB_TYPE.value
-            != outputFormat
-            in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.RGB_TYPE.value
-        ):  # swap R and B channels # rgba -> 0,1,2,3
-            image = image[
-                :,
-                :,
-                (
-                    [2, 1, 0, 3]
-                    if outputFormat
-                    in (COLOR_CHANNEL_FORMAT_GROUPS_ENUM.WITH_ALPHA.value)
-                    else [2, 1, 0]
-                ),
-            ]
-        else:
-            pass  # nothing to swap
+    @staticmethod
+    def getTextureBuffer(
+        cvImage: MatLike,
+        inputChannelFormat: COLOR_CHANNEL_FORMAT_ENUM = COLOR_CHANNEL_FORMAT_ENUM.BGR_AUTO_ALPHA,
+        uploadChannelFormat: COLOR_CHANNEL_FORMAT_ENUM = None,
+        buffer: MatLike = None,
+    ) -> tuple[np.ndarray, COLOR_CHANNEL_FORMAT_ENUM]:
+        # flat uint8 view of the pixels ready for Texture.blit_buffer and its colorfmt,
+        # without an upload format the image is uploaded in its own channel order.
+        # Conversions write into buffer, or a shared buffer of the right shape.
+        inputFormat = CVUtils.resolveChannelFormat(cvImage, inputChannelFormat)
+        uploadFormat = uploadChannelFormat or inputFormat
+        code = CVUtils.getConversionCode(inputFormat, uploadFormat)
+        if code is not None:
+            if buffer is None:
+                shape = CVUtils.getConvertedShape(cvImage, uploadFormat)
+                buffer = CVUtils._conversionBuffers.get(shape)
+                if buffer is None:
+                    buffer = CVUtils._conversionBuffers[shape] = np.empty(shape, np.uint8)
+            cvImage = cv2.cvtColor(cvImage, code, dst=buffer)
+        return np.ascontiguousarray(cvImage).reshape(-1), uploadFormat
 
-        return image
+    @staticmethod
+    def getConvertedShape(
+        cvImage: MatLike, outputFormat: COLOR_CHANNEL_FORMAT_ENUM
+    ) -> tuple[int, int, int]:
+        channelsCount = (
+            4 if outputFormat in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.WITH_ALPHA.value else 3
+        )
+        return cvImage.shape[:2] + (channelsCount,)
 
     @staticmethod
     def cvImageToKivyTexture(
         cvImage: MatLike,
         inputChannelFormat: COLOR_CHANNEL_FORMAT_ENUM = COLOR_CHANNEL_FORMAT_ENUM.BGR_AUTO_ALPHA,
-        outputChannelFormat: COLOR_CHANNEL_FORMAT_ENUM = COLOR_CHANNEL_FORMAT_ENUM.RGBA,
+        outputChannelFormat: COLOR_CHANNEL_FORMAT_ENUM = None,
+        texture: Texture = None,
+        buffer: MatLike = None,
     ) -> Texture:
-        # convert it to texture
-
-        if outputChannelFormat != COLOR_CHANNEL_FORMAT_ENUM.RGBA:
-            raise NotImplementedError()
+        # Uploads the image in its own channel order (Kivy takes bgr/bgra directly) and
+        # converts only when the driver lacks the format. The vertical flip lives in the
+        # texture coordinates. A given texture of the same size and format is written in
+        # place and returned, otherwise a new one is created.
 
-        # keep original image intact
-        rgbaImage = CVUtils.convertChannelFormat(
+        uploadFormat = CVUtils.getUploadFormat(
             cvImage, inputChannelFormat, outputChannelFormat
         )
-
-        # flip image vertically
-        buf1 = cv2.flip(rgbaImage, 0)
-
-        # convert image to bytes
-        buf = buf1.tobytes()
-
-        # create texture sized for the image
-        cvTexture = Texture.create(
-            size=(rgbaImage.shape[1], rgbaImage.shape[0]),
-            colorfmt=outputChannelFormat.value,
+        pixels, uploadFormat = CVUtils.getTextureBuffer(
+            cvImage, inputChannelFormat, uploadFormat, buffer
         )
 
-        # populate texture data from image
-        cvTexture.blit_buffer(
-            buf, colorfmt=outputChannelFormat.value, bufferfmt="ubyte"
-        )
+        size = (cvImage.shape[1], cvImage.shape[0])
+        if (
+            texture is None
+            or texture.size != size
+            or texture.colorfmt != uploadFormat.value
+        ):
+            texture = CVUtils.createTexture(size, uploadFormat)
 
-        return cvTexture
+        texture.blit_buffer(pixels, colorfmt=uploadFormat.value, bufferfmt="ubyte")
+        return texture
+
+    @staticmethod
+    def createTexture(
+        size: tuple[int, int], colorFormat: COLOR_CHANNEL_FORMAT_ENUM
+    ) -> Texture:
+        texture = Texture.create(size=size, colorfmt=colorFormat.value)
+        # opencv rows go top to bottom, flip the uvs once instead of the pixels
+        texture.flip_vertical()
+        return texture
 
     @staticmethod
     def plotData(
@@ -235,30 +283,51 @@ class CVUtils:
         if not len(data):
             return image
 
+        displayPts, centerOfMass = CVUtils.getDataPolyline(
+            data, image.shape[1], image.shape[0], maxValue, minValue
+        )
+        CVUtils.putDataPolyline(image, displayPts, centerOfMass, color, thickness, plotCenterOfMass)
+        return image
+
+    @staticmethod
+    def getDataPolyline(
+        data: list[float],
+        imageWidth: int,
+        imageHeight: int,
+        maxValue: float = None,
+        minValue: float = None,
+    ) -> tuple[np.ndarray, int]:
+        # plotData points spread over the image width and the x of the center of mass
         maxValue = maxValue or np.max(data)
         minValue = minValue or np.min(data)
-        imageHeight, imageWidth = image.shape[0], image.shape[1]
 
         y = np.interp(np.array(data), [minValue, maxValue], [0, imageHeight])
         x = np.linspace(0, imageWidth, len(data))
 
         displayPts = np.array(np.column_stack((x, imageHeight - y)), np.int32)
         displayPts = displayPts.reshape((-1, 1, 2))
+        weight = np.sum(y)
+        centerOfMass = round(np.sum(x * y) / weight) if weight else 0
+        return displayPts, int(centerOfMass)
 
+    @staticmethod
+    def putDataPolyline(
+        image: MatLike,
+        displayPts: np.ndarray,
+        centerOfMass: int,
+        color: RGB_COLORS_ENUM,
+        thickness: int = 1,
+        plotCenterOfMass: bool = True,
+    ):
         cv2.polylines(image, [displayPts], False, color.value, thickness)
-
         if plotCenterOfMass:
-            centerOfMass = round(np.sum(x * y) / np.sum(y))
             cv2.line(
                 image,
-                (int(centerOfMass), 0),
-                (int(centerOfMass), imageHeight - 1),
+                (centerOfMass, 0),
+                (centerOfMass, image.shape[0] - 1),
                 color.value,
                 thickness,
             )
-            pass
-
-        return image
 
     @staticmethod
     def putBoundingBoxes(
@@ -279,20 +348,130 @@ class CVUtils:
             )
         return image
 
+    @staticmethod
+    def calcIntersectionOverUnion(
+        firstRects: list[tuple[int, int, int, int]],
+        secondRects: list[tuple[int, int, int, int]],
+    ) -> np.ndarray:
+        # (len(firstRects), len(secondRects)) matrix of the IoU of every pair
+        first = np.asarray(firstRects, np.float64).reshape(-1, 1, 4)
+        second = np.asarray(secondRects, np.float64).reshape(1, -1, 4)
+        width = np.minimum(
+            first[..., 0] + first[..., 2], second[..., 0] + second[..., 2]
+        ) - np.maximum(first[..., 0], second[..., 0])
+        height = np.minimum(
+            first[..., 1] + first[..., 3], second[..., 1] + second[..., 3]
+        ) - np.maximum(first[..., 1], second[..., 1])
+        intersection = np.maximum(width, 0) * np.maximum(height, 0)
+        union = (
+            first[..., 2] * first[..., 3] + second[..., 2] * second[..., 3] - intersection
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(union > 0, intersection / union, 0.0)
+
     @staticmethod
     def cropCenter(cvImage: MatLike, coverage: float, resize: bool = True) -> MatLike:
         # coverage in values between 0 and 1
-        newSize = np.array(cvImage.shape) * coverage
+        newSize = np.array(cvImage.shape[:2]) * coverage
         horizontalMargin = int((cvImage.shape[1] - newSize[1]) // 2)
         verticalMargin = int((cvImage.shape[0] - newSize[0]) // 2)
 
         croppedImage = cvImage[
-            verticalMargin : int(cvImage.shape[0] - newSize[0]),
-            horizontalMargin : int(cvImage.shape[1] - newSize[1]),
+            verticalMargin : verticalMargin + int(newSize[0]),
+            horizontalMargin : horizontalMargin + int(newSize[1]),
         ]
 
         return croppedImage
 
+    # integral images per key (e.g. camera stream): [sequence, shape, sum, squared sum]
+    _integralImages: dict = {}
+
+    @staticmethod
+    def getIntegralImages(
+        cvImage: MatLike, key=None, sequence: int = None, squared: bool = False
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # float64 (h + 1, w + 1[, c]) sums, built once per (key, sequence) and shared by
+        # every caller of that frame. The squared sums cost ~5x more, only built on request.
+        # Without a sequence the frame cannot be identified and nothing is cached
+        if sequence is None:
+            key = None
+        cached = CVUtils._integralImages.get(key) if key is not None else None
+        if cached is None or cached[0] != sequence or cached[1] != cvImage.shape:
+            cached = [sequence, cvImage.shape, None, None]
+        if squared and cached[3] is None:
+            cached[2], cached[3] = cv2.integral2(
+                cvImage, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F
+            )
+        elif cached[2] is None:
+            cached[2] = cv2.integral(cvImage, sdepth=cv2.CV_64F)
+        if key is not None:
+            CVUtils._integralImages[key] = cached
+        return cached[2], cached[3]
+
+    @staticmethod
+    def calcRegionStatistics(
+        cvImage: MatLike,
+        rects: list[tuple[int, int, int, int]],
+        key=None,
+        sequence: int = None,
+        variances: bool = False,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # per-rect channel means (n, c), variances (n, c) or None and pixel areas (n,),
+        # rects are clipped to the image, empty ones get area 0 and nan statistics
+        integral, squaredIntegral = CVUtils.getIntegralImages(
+            cvImage, key, sequence, variances
+        )
+        height, width = cvImage.shape[:2]
+        boxes = np.asarray(rects, np.int64).reshape(-1, 4)
+        x0 = np.clip(boxes[:, 0], 0, width)
+        y0 = np.clip(boxes[:, 1], 0, height)
+        x1 = np.clip(boxes[:, 0] + boxes[:, 2], x0, width)
+        y1 = np.clip(boxes[:, 1] + boxes[:, 3], y0, height)
+        areas = (x1 - x0) * (y1 - y0)
+
+        def gather(table: np.ndarray) -> np.ndarray:
+            sums = table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+            return sums.reshape(len(boxes), -1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = gather(integral) / areas[:, None]
+            regionVariances = None
+            if variances:
+                regionVariances = np.maximum(
+                    gather(squaredIntegral) / areas[:, None] - means * means, 0
+                )
+        return means, regionVariances, areas
+
+    @staticmethod
+    def calcChannelMeans(
+        cvImage: MatLike,
+        rects: list[tuple[int, int, int, int]] = None,
+        decimation: int = 1,
+    ) -> tuple[float, ...]:
+        # per-channel mean in image channel order, over the whole image or the union of rects
+        # (pixel weighted), reading only every decimation-th row: OpenCV takes row strides
+        # as they are, while column strides would force a copy of the region
+        channelsCount = cvImage.shape[2] if cvImage.ndim == 3 else 1
+        if rects is None:
+            return cv2.mean(cvImage[::decimation])[:channelsCount]
+
+        imageHeight, imageWidth = cvImage.shape[:2]
+        sums = np.zeros(channelsCount)
+        totalArea = 0
+        for x, y, w, h in rects:
+            x0, y0 = max(0, x), max(0, y)
+            x1, y1 = min(imageWidth, x + w), min(imageHeight, y + h)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            region = cvImage[y0:y1:decimation, x0:x1]
+            area = region.shape[0] * region.shape[1]
+            sums += np.array(cv2.mean(region)[:channelsCount]) * area
+            totalArea += area
+
+        if not totalArea:
+            return (float("nan"),) * channelsCount
+        return tuple((sums / totalArea).tolist())
+
     @staticmethod
     def overlayIcon(bg: MatLike, icon: MatLike, position: tuple[int, int]) -> MatLike:
         x, y = position
@@ -342,10 +521,57 @@ class CVUtils:
         color: RGB_COLORS_ENUM,
         format: COLOR_CHANNEL_FORMAT_ENUM,
     ) -> None:
-        icon = icon
-        icon = CVUtils.optionalResize(icon, size, True)
-        icon = CVUtils.recolor(icon, format, color)
-        CVUtils.overlayIcon(image, icon, position)
+        sprite, inverseAlpha = CVUtils.getIconSprite(icon, size, color, format)
+        CVUtils.overlaySprite(image, sprite, inverseAlpha, position)
+
+    # premultiplied sprites by (icon, size, color, format), see getIconSprite
+    _iconSprites: dict[tuple, tuple[MatLike, MatLike]] = {}
+
+    @staticmethod
+    def getIconSprite(
+        icon: ICON_ENUM,
+        size: tuple[int, int],
+        color: RGB_COLORS_ENUM,
+        format: COLOR_CHANNEL_FORMAT_ENUM,
+    ) -> tuple[MatLike, MatLike]:
+        # resized, recolored, alpha premultiplied uint8 sprite and its 255 - alpha,
+        # built once per key
+        key = (icon, tuple(size), color, format)
+        cached = CVUtils._iconSprites.get(key)
+        if cached is None:
+            resized = CVUtils.optionalResize(AssetManager.getIcon(icon), size, True)
+            recolored = CVUtils.recolor(resized, format, color)
+            alpha = recolored[:, :, 3:4] / 255.0
+            sprite = np.round(recolored[:, :, :3] * alpha).astype(np.uint8)
+            inverseAlpha = cv2.merge([255 - resized[:, :, 3]] * 3)
+            cached = CVUtils._iconSprites[key] = (sprite, inverseAlpha)
+        return cached
+
+    @staticmethod
+    def overlaySprite(
+        bg: MatLike,
+        sprite: MatLike,
+        inverseAlpha: MatLike,
+        position: tuple[int, int],
+    ) -> MatLike:
+        # bg = bg * (255 - alpha) / 255 + premultiplied sprite, in uint8 on the ROI
+        x, y = position
+        h = min(sprite.shape[0], bg.shape[0] - y)
+        w = min(sprite.shape[1], bg.shape[1] - x)
+        if h <= 0 or w <= 0:
+            return bg
+        sprite = sprite[:h, :w]
+        inverseAlpha = inverseAlpha[:h, :w]
+
+        roi = bg[y : y + h, x : x + w]
+        if roi.shape[2] == 3:
+            cv2.multiply(roi, inverseAlpha, dst=roi, scale=1 / 255)
+            cv2.add(roi, sprite, dst=roi)
+        else:
+            # alpha channel of the background stays, blend a copy of the colors
+            colors = cv2.multiply(roi[:, :, :3], inverseAlpha, scale=1 / 255)
+            roi[:, :, :3] = cv2.add(colors, sprite, dst=colors)
+        return bg
 
     @staticmethod
     def calcSharpness(image: MatLike) -> float:
@@ -4,7 +4,13 @@ from utils.CVUtils import (
     CVUtils,
     MatLike
 )
+from utils.AssetManager import AssetManager
+from utils.StatisticsManager import StatisticsManager
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+import numpy as np
+import threading
+import time
 import cv2
 
 class EMBEDDING_ALGORITHM_ENUM(Enum):
@@ -17,36 +23,332 @@ class FaceDetector:
         self,
         haarcascadeClassifier: HAARCASCADE_ENUM,
         maxImageSize: RESOLUTION_ENUM,
+        redetectionInterval: int = 10,
+        trackingThreshold: float = 0.6,
+        trackingSearchMargin: float = 0.25,
+        searchMargin: float = 0.5,
+        searchScaleTolerance: float = 0.3,
+        fullScanInterval: int = 3,
+        statisticsManager: StatisticsManager = None,
+        maxWorkers: int = 2,
     ):
-        self.haarcascadeClassifier = cv2.CascadeClassifier(
-          haarcascadeClassifier.value
-        )
+        # the cascade XML is parsed on first detection, not at construction
+        self.haarcascadeClassifierType = haarcascadeClassifier
         self.maxImageSize = maxImageSize.value
         self.timingMetrics = {}
 
+        # detect-then-track, see detectFaces
+        self.redetectionInterval: int = max(1, redetectionInterval)
+        self.trackingThreshold: float = trackingThreshold
+        self.trackingSearchMargin: float = trackingSearchMargin
+        self.tracks: dict[object, dict] = {}
+        self.detectionsCount: int = 0
+        self.trackingCount: int = 0
+
+        # cascade passes near known faces, see detectNear
+        self.searchMargin: float = searchMargin
+        self.searchScaleTolerance: float = searchScaleTolerance
+        self.fullScanInterval: int = max(1, fullScanInterval)
+        self.statisticsManager = statisticsManager
+        self.lastSearchStatistics: dict = {}
+
+        # batches, see detectFacesBatch
+        self.maxWorkers: int = max(1, maxWorkers)
+        self.executor: ThreadPoolExecutor = None
+        self.buffers: dict[object, dict[str, MatLike]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def haarcascadeClassifier(self) -> cv2.CascadeClassifier:
+        return AssetManager.getCascade(self.haarcascadeClassifierType)
+
+    def preprocess(self, cvImage: MatLike, resize: bool = True, streamId=None) -> MatLike:
+        # with a streamId the resized and greyscale images go into that stream's buffers,
+        # the result is then only valid until the next call for the stream
+        if streamId is None:
+            image = CVUtils.optionalResize(cvImage, self.maxImageSize, resize)
+            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        buffers = self.buffers.get(streamId)
+        if buffers is None or buffers["source"] != cvImage.shape:
+            width, height = cvImage.shape[1], cvImage.shape[0]
+            if resize and width * height > self.maxImageSize[0] * self.maxImageSize[1]:
+                width, height = self.maxImageSize
+            buffers = self.buffers[streamId] = {
+                "source": cvImage.shape,
+                "resized": np.empty((height, width) + cvImage.shape[2:], np.uint8),
+                "grey": np.empty((height, width), np.uint8),
+            }
+        image = cvImage
+        if buffers["resized"].shape != cvImage.shape:
+            image = cv2.resize(
+                cvImage, buffers["grey"].shape[::-1], dst=buffers["resized"]
+            )
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=buffers["grey"])
+
+    def detect(
+        self,
+        greyscaleImage: MatLike,
+        searchRegion: tuple[int, int, int, int] = None,
+        minSize: tuple[int, int] = (40, 40),
+        maxSize: tuple[int, int] = None,
+        scaleFactor: float = 1.1,
+    ) -> list[tuple[int, int, int, int]]:
+        # cascade pass over searchRegion (whole image without one), boxes in
+        # greyscaleImage coordinates, the cost of the call lands in lastSearchStatistics
+        offsetX, offsetY = 0, 0
+        image = greyscaleImage
+        if searchRegion is not None:
+            offsetX, offsetY, w, h = searchRegion
+            image = greyscaleImage[offsetY : offsetY + h, offsetX : offsetX + w]
+
+        classifier = self.haarcascadeClassifier
+        faceBoundingBoxes = classifier.detectMultiScale(
+            image,
+            scaleFactor=scaleFactor,
+            minNeighbors=5,
+            minSize=minSize,
+            maxSize=maxSize or (0, 0),
+        )
+
+        pixelsScanned, scalesEvaluated = FaceDetector.estimateSearchCost(
+            (image.shape[1], image.shape[0]),
+            tuple(classifier.getOriginalWindowSize()),
+            scaleFactor,
+            minSize,
+            maxSize,
+        )
+        with self._lock:
+            self.lastSearchStatistics = {
+                "searchRegion": searchRegion,
+                "pixelsScanned": pixelsScanned,
+                "scalesEvaluated": scalesEvaluated,
+                "facesFound": len(faceBoundingBoxes),
+            }
+            if self.statisticsManager is not None:
+                self.statisticsManager.addValue("facePixelsScanned", pixelsScanned)
+                self.statisticsManager.addValue("faceScalesEvaluated", scalesEvaluated)
+
+        return [
+            (int(x) + offsetX, int(y) + offsetY, int(w), int(h))
+            for x, y, w, h in faceBoundingBoxes
+        ]
+
+    @staticmethod
+    def estimateSearchCost(
+        imageSize: tuple[int, int],
+        windowSize: tuple[int, int],
+        scaleFactor: float,
+        minSize: tuple[int, int] = None,
+        maxSize: tuple[int, int] = None,
+    ) -> tuple[int, int]:
+        # pixels of all scaled images and number of scales detectMultiScale evaluates,
+        # same scale walk as OpenCV's CascadeClassifier
+        pixelsScanned, scalesEvaluated = 0, 0
+        factor = 1.0
+        while True:
+            scaledWindow = (round(windowSize[0] * factor), round(windowSize[1] * factor))
+            scaledImage = (round(imageSize[0] / factor), round(imageSize[1] / factor))
+            if scaledImage[0] < windowSize[0] or scaledImage[1] < windowSize[1]:
+                break
+            if maxSize and (scaledWindow[0] > maxSize[0] or scaledWindow[1] > maxSize[1]):
+                break
+            factor *= scaleFactor
+            if minSize and (scaledWindow[0] < minSize[0] or scaledWindow[1] < minSize[1]):
+                continue
+            pixelsScanned += scaledImage[0] * scaledImage[1]
+            scalesEvaluated += 1
+        return pixelsScanned, scalesEvaluated
+
+    def getSearchParameters(
+        self, boundingBoxes: list[tuple[int, int, int, int]], imageShape: tuple
+    ) -> tuple[tuple[int, int, int, int], tuple[int, int], tuple[int, int]]:
+        # region around the known faces padded by the expected motion, and the face
+        # sizes they can reach, as (searchRegion, minSize, maxSize)
+        imageHeight, imageWidth = imageShape[:2]
+        left, top, right, bottom = imageWidth, imageHeight, 0, 0
+        smallest, largest = float("inf"), 0
+        for x, y, w, h in boundingBoxes:
+            marginX, marginY = w * self.searchMargin, h * self.searchMargin
+            left = min(left, x - marginX)
+            top = min(top, y - marginY)
+            right = max(right, x + w + marginX)
+            bottom = max(bottom, y + h + marginY)
+            smallest = min(smallest, w, h)
+            largest = max(largest, w, h)
+
+        left, top = max(0, int(left)), max(0, int(top))
+        right, bottom = min(imageWidth, int(right)), min(imageHeight, int(bottom))
+        minSide = max(40, int(smallest * (1 - self.searchScaleTolerance)))
+        maxSide = int(largest * (1 + self.searchScaleTolerance)) + 1
+        return (left, top, right - left, bottom - top), (minSide, minSide), (maxSide, maxSide)
+
+    def detectNear(
+        self, greyscaleImage: MatLike, boundingBoxes: list[tuple[int, int, int, int]]
+    ) -> list[tuple[int, int, int, int]]:
+        # bounded search around the previous boxes, full frame scan when it finds nothing
+        if boundingBoxes:
+            searchRegion, minSize, maxSize = self.getSearchParameters(
+                boundingBoxes, greyscaleImage.shape
+            )
+            if searchRegion[2] >= minSize[0] and searchRegion[3] >= minSize[1]:
+                found = self.detect(greyscaleImage, searchRegion, minSize, maxSize)
+                if found:
+                    return found
+        return self.detect(greyscaleImage)
+
+    @staticmethod
+    def scaleBoundingBoxes(
+        boundingBoxes: list[tuple[int, int, int, int]],
+        horizontalRatio: float,
+        verticalRatio: float,
+    ) -> list[tuple[int, int, int, int]]:
+        return [
+            (
+                round(x * horizontalRatio),
+                round(y * verticalRatio),
+                round(w * horizontalRatio),
+                round(h * verticalRatio),
+            )
+            for x, y, w, h in boundingBoxes
+        ]
 
     def extractFaceBoundingBoxes(
         self, cvImage: MatLike, resize: bool = True
     ) -> list[tuple[int, int, int, int]]:
-        image = CVUtils.optionalResize(cvImage, self.maxImageSize, resize)
-        greyscaleImage = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faceBoundingBoxes = self.haarcascadeClassifier.detectMultiScale(
-            greyscaleImage, scaleFactor=1.1, minNeighbors=5, minSize=(40, 40)
+        greyscaleImage = self.preprocess(cvImage, resize)
+        return FaceDetector.scaleBoundingBoxes(
+            self.detect(greyscaleImage),
+            cvImage.shape[1] / greyscaleImage.shape[1],
+            cvImage.shape[0] / greyscaleImage.shape[0],
         )
 
-        resizedBoundingBoxes = []
-        horizontalRatio = cvImage.shape[1] / self.maxImageSize[0]
-        verticalRatio = cvImage.shape[0] / self.maxImageSize[1]
-        for x, y, w, h in faceBoundingBoxes:
-            resizedBoundingBoxes.append(
-                (
-                    round(x * horizontalRatio),
-                    round(y * verticalRatio),
-                    round(w * horizontalRatio),
-                    round(h * verticalRatio),
+    def detectFacesBatch(
+        self, images: list[MatLike], streamIds: list = None, tracking: bool = True
+    ) -> list[dict]:
+        # One call for the frames of several streams (unique streamIds). Each frame is
+        # preprocessed into its stream's buffers and the cascade runs are spread over
+        # maxWorkers threads, every thread with its own classifier. Per frame the result
+        # holds streamId, boxes (frame coordinates) and seconds.
+        if streamIds is None:
+            streamIds = list(range(len(images)))
+
+        def run(image: MatLike, streamId) -> dict:
+            startTime = time.perf_counter()
+            if tracking:
+                boxes = self.detectFaces(image, streamId)
+            else:
+                greyscaleImage = self.preprocess(image, streamId=streamId)
+                boxes = FaceDetector.scaleBoundingBoxes(
+                    self.detect(greyscaleImage),
+                    image.shape[1] / greyscaleImage.shape[1],
+                    image.shape[0] / greyscaleImage.shape[0],
                 )
+            return {
+                "streamId": streamId,
+                "boxes": boxes,
+                "seconds": time.perf_counter() - startTime,
+            }
+
+        if len(images) <= 1 or self.maxWorkers <= 1:
+            return [run(image, streamId) for image, streamId in zip(images, streamIds)]
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                self.maxWorkers, thread_name_prefix="faceDetection"
+            )
+        futures = [
+            self.executor.submit(run, image, streamId)
+            for image, streamId in zip(images, streamIds)
+        ]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def detectFaces(
+        self, cvImage: MatLike, streamId=0, resize: bool = True
+    ) -> list[tuple[int, int, int, int]]:
+        # Detect-then-track per stream: after a cascade pass every face is followed by
+        # template matching in a small window around its last box. The cascade runs
+        # again every redetectionInterval frames, when a match scores below
+        # trackingThreshold or while no face is tracked. Re-detections search near the
+        # tracked faces, only every fullScanInterval-th pass scans the whole frame.
+        greyscaleImage = self.preprocess(cvImage, resize, streamId)
+        track = self.tracks.get(streamId)
+        if track is not None and track["shape"] != greyscaleImage.shape:
+            track = None
+
+        boundingBoxes = None
+        if (
+            track is not None
+            and track["boxes"]
+            and track["age"] < self.redetectionInterval
+        ):
+            boundingBoxes = self.track(greyscaleImage, track)
+
+        if boundingBoxes is None:
+            # new faces can only show up in a full scan
+            passes = track["passes"] + 1 if track is not None else 0
+            if track is not None and track["boxes"] and passes % self.fullScanInterval:
+                boundingBoxes = self.detectNear(greyscaleImage, track["boxes"])
+            else:
+                boundingBoxes = self.detect(greyscaleImage)
+            with self._lock:
+                self.detectionsCount += 1
+            self.tracks[streamId] = track = {
+                "boxes": boundingBoxes,
+                "templates": [
+                    greyscaleImage[y : y + h, x : x + w].copy()
+                    for x, y, w, h in boundingBoxes
+                ],
+                "shape": greyscaleImage.shape,
+                "age": 0,
+                "passes": passes,
+            }
+        else:
+            with self._lock:
+                self.trackingCount += 1
+            track["boxes"] = boundingBoxes
+        track["age"] += 1
+
+        return FaceDetector.scaleBoundingBoxes(
+            boundingBoxes,
+            cvImage.shape[1] / greyscaleImage.shape[1],
+            cvImage.shape[0] / greyscaleImage.shape[0],
+        )
+
+    def track(
+        self, greyscaleImage: MatLike, track: dict
+    ) -> list[tuple[int, int, int, int]] | None:
+        # new boxes of every tracked face, None as soon as one match is not confident
+        imageHeight, imageWidth = greyscaleImage.shape[:2]
+        boundingBoxes = []
+        for (x, y, w, h), template in zip(track["boxes"], track["templates"]):
+            marginX = max(1, round(w * self.trackingSearchMargin))
+            marginY = max(1, round(h * self.trackingSearchMargin))
+            left, top = max(0, x - marginX), max(0, y - marginY)
+            right = min(imageWidth, x + w + marginX)
+            bottom = min(imageHeight, y + h + marginY)
+            if right - left < w or bottom - top < h:
+                return None
+
+            scores = cv2.matchTemplate(
+                greyscaleImage[top:bottom, left:right], template, cv2.TM_CCOEFF_NORMED
             )
-        return resizedBoundingBoxes
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if score < self.trackingThreshold:
+                return None
+            boundingBoxes.append((left + dx, top + dy, w, h))
+        return boundingBoxes
+
+    def resetTracking(self, streamId=None):
+        if streamId is None:
+            self.tracks.clear()
+        else:
+            self.tracks.pop(streamId, None)
 
     @staticmethod
     def extractForeheadBoundingBox(
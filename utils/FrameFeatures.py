@@ -0,0 +1,149 @@
+from utils.CVUtils import (
+    COLOR_CHANNEL_FORMAT_ENUM,
+    COLOR_CHANNEL_FORMAT_GROUPS_ENUM,
+    CVUtils,
+    MatLike,
+)
+import numpy as np
+import cv2
+
+
+class FrameFeatures:
+    # compact per-frame record shared by finger detection and PPG sampling
+    __slots__ = ("sharpness", "channelMeans", "greenClippedFraction", "darkFraction")
+
+    def __init__(
+        self,
+        sharpness: float,
+        channelMeans: tuple[float, ...],
+        greenClippedFraction: float,
+        darkFraction: float,
+    ):
+        self.sharpness = sharpness  # stddev of the Laplacian, sharpnessWidth wide grey
+        self.channelMeans = channelMeans  # sampled region, image channel order
+        self.greenClippedFraction = greenClippedFraction  # sampled region
+        self.darkFraction = darkFraction  # sampled region
+
+
+class FrameFeatureExtractor:
+    # The frame is read once, into a decimated copy, every feature comes from that copy
+    # and all buffers are preallocated. Sharpness depends on the scale it is measured at,
+    # so it is taken on a grey image of a fixed width (sharpnessWidth, the decimated grey
+    # itself when it has that width) and thresholds do not change with the decimation or
+    # the camera resolution.
+
+    def __init__(
+        self,
+        decimation: int = 1,
+        clipHigh: int = 250,
+        clipLow: int = 5,
+        sharpnessWidth: int = 320,
+    ):
+        self.decimation: int = max(1, int(decimation))
+        self.clipHigh: int = clipHigh
+        self.clipLow: int = clipLow
+        self.sharpnessWidth: int = sharpnessWidth
+        self._buffersShape: tuple = None
+
+    def _ensureBuffers(self, frame: MatLike):
+        if self._buffersShape == frame.shape:
+            return
+        self._buffersShape = frame.shape
+        height = max(1, frame.shape[0] // self.decimation)
+        width = max(1, frame.shape[1] // self.decimation)
+        # without decimation the frame itself is used, no copy
+        self._small = None
+        if self.decimation > 1:
+            self._small = np.empty((height, width) + frame.shape[2:], np.uint8)
+        self._grey = np.empty((height, width), np.uint8)
+        self._mask = np.empty((height, width), np.uint8)
+
+        self._sharpnessGrey = self._grey
+        if width != self.sharpnessWidth:
+            sharpnessHeight = max(1, round(height * self.sharpnessWidth / width))
+            self._sharpnessGrey = np.empty((sharpnessHeight, self.sharpnessWidth), np.uint8)
+        self._laplacian = np.empty(self._sharpnessGrey.shape, np.int16)
+
+    def _greyConversion(
+        self, frame: MatLike, colorFormat: COLOR_CHANNEL_FORMAT_ENUM
+    ) -> int:
+        isRGB = colorFormat in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.RGB_TYPE.value
+        if frame.shape[2] == 4:
+            return cv2.COLOR_RGBA2GRAY if isRGB else cv2.COLOR_BGRA2GRAY
+        return cv2.COLOR_RGB2GRAY if isRGB else cv2.COLOR_BGR2GRAY
+
+    def extract(
+        self,
+        frame: MatLike,
+        colorFormat: COLOR_CHANNEL_FORMAT_ENUM,
+        regions: list[tuple[int, int, int, int]] = None,
+        coverage: float = 1,
+    ) -> FrameFeatures:
+        # regions are in frame coordinates, without them a central crop of coverage is sampled
+        self._ensureBuffers(frame)
+        small = frame
+        if self._small is not None:
+            small = self._small
+            cv2.resize(
+                frame,
+                (small.shape[1], small.shape[0]),
+                dst=small,
+                interpolation=cv2.INTER_NEAREST,
+            )
+        cv2.cvtColor(small, self._greyConversion(frame, colorFormat), dst=self._grey)
+
+        if self._sharpnessGrey is not self._grey:
+            cv2.resize(
+                self._grey,
+                (self._sharpnessGrey.shape[1], self._sharpnessGrey.shape[0]),
+                dst=self._sharpnessGrey,
+                interpolation=cv2.INTER_NEAREST,
+            )
+        cv2.Laplacian(self._sharpnessGrey, cv2.CV_16S, dst=self._laplacian)
+        _, stddev = cv2.meanStdDev(self._laplacian)
+        sharpness = stddev[0, 0]
+
+        d = self.decimation
+        if regions:
+            rects = [
+                (x // d, y // d, max(1, w // d), max(1, h // d)) for x, y, w, h in regions
+            ]
+        else:
+            # same crop as CVUtils.cropCenter, as a rect so all stats share it
+            height, width = small.shape[:2]
+            rects = [
+                (
+                    int((width - width * coverage) // 2),
+                    int((height - height * coverage) // 2),
+                    int(width * coverage),
+                    int(height * coverage),
+                )
+            ]
+        channelMeans = CVUtils.calcChannelMeans(small, rects)
+
+        # clipping stats, masks are written into views of one preallocated buffer
+        channelsCount = small.shape[2]
+        # green, same index in RGB and BGR
+        lower = [0] * channelsCount
+        lower[1] = self.clipHigh
+        lower = tuple(lower)
+        upper = (255,) * channelsCount
+        clippedCount = 0
+        darkCount = 0
+        area = 0
+        for x, y, w, h in rects:
+            region = (slice(max(0, y), max(0, y + h)), slice(max(0, x), max(0, x + w)))
+            image = small[region]
+            mask = self._mask[region]
+            if not mask.size:
+                continue
+            area += mask.size
+            cv2.inRange(image, lower, upper, dst=mask)
+            clippedCount += cv2.countNonZero(mask)
+            cv2.inRange(self._grey[region], 0, self.clipLow, dst=mask)
+            darkCount += cv2.countNonZero(mask)
+
+        area = max(1, area)
+        return FrameFeatures(
+            sharpness, channelMeans, clippedCount / area, darkCount / area
+        )
@@ -0,0 +1,75 @@
+from utils.CVUtils import RGB_COLORS_ENUM, CVUtils, MatLike
+import numpy as np
+import cv2
+
+
+class HistogramService:
+    # Channel histograms computed once per frame of a stream, keyed by the frame sequence,
+    # optionally on a grid of every subsampling-th row and column.
+    # The overlay drawn from them is rebuilt only every overlayDivider-th frame of a
+    # stream, in between the cached polylines are drawn again.
+
+    def __init__(self, subsampling: int = 1, overlayDivider: int = 1):
+        self.subsampling: int = max(1, int(subsampling))
+        self.overlayDivider: int = max(1, int(overlayDivider))
+        self.histograms: dict[object, tuple[int, list[np.ndarray]]] = {}
+        self.overlays: dict[object, dict] = {}
+        self.computedCount: int = 0
+
+    def getHistograms(self, streamId, sequence: int, image: MatLike) -> list[np.ndarray]:
+        # 256 bin histogram per channel, in the channel order of the image
+        cached = self.histograms.get(streamId)
+        if cached is not None and cached[0] == sequence:
+            return cached[1]
+
+        if self.subsampling > 1:
+            image = np.ascontiguousarray(image[:: self.subsampling, :: self.subsampling])
+        hists = [
+            cv2.calcHist([image], [channel], None, [256], [0, 256]).reshape(256)
+            for channel in range(image.shape[2])
+        ]
+        self.histograms[streamId] = (sequence, hists)
+        self.computedCount += 1
+        return hists
+
+    def putHistograms(
+        self,
+        image: MatLike,
+        streamId,
+        sequence: int,
+        source: MatLike,
+        colors: list[RGB_COLORS_ENUM],
+        plotCenterOfMass: bool = True,
+    ):
+        # draws the histograms of source (first len(colors) channels) onto image
+        overlay = self.overlays.get(streamId)
+        height, width = image.shape[:2]
+        if (
+            overlay is None
+            or overlay["size"] != (width, height)
+            or overlay["age"] >= self.overlayDivider
+        ):
+            hists = self.getHistograms(streamId, sequence, source)[: len(colors)]
+            maxValue = max(np.max(hist) for hist in hists)
+            overlay = self.overlays[streamId] = {
+                "size": (width, height),
+                "age": 0,
+                "polylines": [
+                    CVUtils.getDataPolyline(hist, width, height, maxValue)
+                    for hist in hists
+                ],
+            }
+        overlay["age"] += 1
+
+        for color, (displayPts, centerOfMass) in zip(colors, overlay["polylines"]):
+            CVUtils.putDataPolyline(
+                image, displayPts, centerOfMass, color, plotCenterOfMass=plotCenterOfMass
+            )
+
+    def reset(self, streamId=None):
+        if streamId is None:
+            self.histograms.clear()
+            self.overlays.clear()
+        else:
+            self.histograms.pop(streamId, None)
+            self.overlays.pop(streamId, None)
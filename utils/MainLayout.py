@@ -26,10 +26,13 @@ class MainLayout(BoxLayout):
         super(MainLayout, self).__init__(**kwargs)
         self.orientation = "vertical"
 
-        self.cvMainCamCanvas = Image()
+        # native sized previews have to be scaled up by the widget
+        fitMode = "contain" if SettingsManager.PREVIEW_GPU_SCALING else "scale-down"
+
+        self.cvMainCamCanvas = Image(fit_mode=fitMode)
         self.add_widget(self.cvMainCamCanvas)
 
-        self.cvFrontCamCanvas = Image()
+        self.cvFrontCamCanvas = Image(fit_mode=fitMode)
         self.add_widget(self.cvFrontCamCanvas)
 
         # create widget
@@ -37,7 +40,7 @@ class MainLayout(BoxLayout):
         mainApp: App = App.get_running_app()
         button1.bind(
             on_press=lambda instance: print(
-                np.array(mainApp.fingerPulseExtractor.sampleBuffer),
+                np.array(mainApp.fingerPulseExtractor.sampleBuffer.values),
                 mainApp.fingerPulseExtractor.averageSamplingRate,
                 mainApp.fingerPulseExtractor.window,
             )
@@ -0,0 +1,111 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Any
+from kivy.clock import Clock
+import threading
+
+
+class ProcessingScheduler:
+    # Runs slow per-frame work on a thread pool (OpenCV and NumPy release the GIL)
+    # and publishes results back on the Kivy main thread.
+    # Jobs are grouped by key: at most one job per key is running and at most one
+    # is waiting, newer submissions replace the waiting one (latest input wins),
+    # and results older than the last published one for a key are discarded.
+
+    def __init__(
+        self,
+        maxWorkers: int = 2,
+        publish: Callable[[Callable[[], None]], None] = None,
+    ):
+        self.executor = ThreadPoolExecutor(
+            max_workers=maxWorkers, thread_name_prefix="ProcessingScheduler"
+        )
+        self.publish = publish or (
+            lambda deliver: Clock.schedule_once(lambda dt: deliver())
+        )
+        self.lock = threading.Lock()
+        self.sequence: int = 0
+        self.runningJobs: dict[str, Future] = {}
+        self.waitingJobs: dict[str, tuple] = {}
+        self.publishedSequences: dict[str, int] = {}
+        self.submittedCount: dict[str, int] = {}
+        self.droppedCount: dict[str, int] = {}
+
+    def submit(
+        self,
+        key: str,
+        func: Callable[..., Any],
+        callback: Callable[[Any], None],
+        *args,
+        **kwargs,
+    ) -> bool:
+        # returns True if the job started right away, False if it has to wait
+        with self.lock:
+            self.sequence += 1
+            job = (self.sequence, func, callback, args, kwargs)
+            self.submittedCount[key] = self.submittedCount.get(key, 0) + 1
+
+            if key in self.runningJobs:
+                if key in self.waitingJobs:
+                    self.droppedCount[key] = self.droppedCount.get(key, 0) + 1
+                self.waitingJobs[key] = job
+                return False
+
+            future = self._start(key, job)
+        self._watch(key, job, future)
+        return True
+
+    def isBusy(self, key: str) -> bool:
+        with self.lock:
+            return key in self.runningJobs
+
+    def _start(self, key: str, job: tuple) -> Future:
+        # must be called with self.lock held, pass the future to _watch after releasing it
+        _, func, _, args, kwargs = job
+        future = self.executor.submit(func, *args, **kwargs)
+        self.runningJobs[key] = future
+        return future
+
+    def _watch(self, key: str, job: tuple, future: Future):
+        # must be called without self.lock: a job that already finished runs _onDone
+        # right here, and _onDone takes the lock
+        sequence, _, callback, _, _ = job
+        future.add_done_callback(
+            lambda finished: self._onDone(key, sequence, callback, finished)
+        )
+
+    def _onDone(
+        self, key: str, sequence: int, callback: Callable[[Any], None], future: Future
+    ):
+        nextFuture = None
+        with self.lock:
+            self.runningJobs.pop(key, None)
+            waitingJob = self.waitingJobs.pop(key, None)
+            if waitingJob is not None:
+                nextFuture = self._start(key, waitingJob)
+        if nextFuture is not None:
+            self._watch(key, waitingJob, nextFuture)
+
+        if future.cancelled():
+            return
+
+        exception = future.exception()
+        if exception is not None:
+            print(f"Processing job {key} failed:", repr(exception))
+            return
+
+        result = future.result()
+        self.publish(lambda: self._deliver(key, sequence, callback, result))
+
+    def _deliver(
+        self, key: str, sequence: int, callback: Callable[[Any], None], result: Any
+    ):
+        # latest result wins, stale results that arrive late are dropped
+        if sequence <= self.publishedSequences.get(key, 0):
+            return
+        self.publishedSequences[key] = sequence
+        callback(result)
+
+    def shutdown(self, wait: bool = False):
+        with self.lock:
+            self.waitingJobs.clear()
+        self.executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,177 @@
+from collections import deque
+from typing import Callable, TypeVar, ParamSpec
+import functools
+import threading
+import json
+import time
+import os
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class Span:
+    __slots__ = ("name", "threadId", "startNs", "endNs", "children")
+
+    def __init__(self, name: str, threadId: int, startNs: int):
+        self.name = name
+        self.threadId = threadId
+        self.startNs = startNs
+        self.endNs: int = None
+        self.children: list[Span] = []
+
+    @property
+    def durationNs(self) -> int:
+        return (self.endNs or time.perf_counter_ns()) - self.startNs
+
+    def toDict(self) -> dict:
+        return {
+            "name": self.name,
+            "durationMs": self.durationNs / 1e6,
+            "children": [child.toDict() for child in self.children],
+        }
+
+
+class _NullSpan:
+    # shared no-op context manager handed out while the profiler is disabled
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _ActiveSpan:
+    __slots__ = ("profiler", "name", "span")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.span: Span = None
+
+    def __enter__(self) -> Span:
+        self.span = self.profiler._open(self.name)
+        return self.span
+
+    def __exit__(self, *exc):
+        self.profiler._close(self.span)
+        return False
+
+
+class _FrameSpan(_ActiveSpan):
+    __slots__ = ()
+
+    def __exit__(self, *exc):
+        super().__exit__(*exc)
+        with self.profiler._lock:
+            self.profiler.frames.append(self.span)
+        return False
+
+
+class Profiler:
+    # Span based profiler on perf_counter_ns.
+    # Spans nest per thread (parent/child), finished root spans are kept in a bounded
+    # history, frame() marks one root per rendered frame. While disabled, span() returns
+    # a shared no-op object and profile() calls straight through.
+
+    def __init__(self, enabled: bool = False, maxRootSpans: int = 10000):
+        self.enabled: bool = enabled
+        self.rootSpans: deque[Span] = deque(maxlen=maxRootSpans)
+        self.frames: deque[Span] = deque(maxlen=maxRootSpans)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> list[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _open(self, name: str) -> Span:
+        stack = self._stack()
+        span = Span(name, threading.get_ident(), time.perf_counter_ns())
+        if stack:
+            stack[-1].children.append(span)
+        stack.append(span)
+        return span
+
+    def _close(self, span: Span):
+        span.endNs = time.perf_counter_ns()
+        stack = self._stack()
+        # tolerate spans closed out of order, drop everything opened after this one
+        while stack and stack.pop() is not span:
+            pass
+        if not stack:
+            with self._lock:
+                self.rootSpans.append(span)
+
+    def span(self, name: str):
+        if not self.enabled:
+            return NULL_SPAN
+        return _ActiveSpan(self, name)
+
+    def frame(self, name: str = "frame"):
+        # root span of one rendered frame, kept in self.frames as a span tree
+        if not self.enabled:
+            return NULL_SPAN
+        return _FrameSpan(self, name)
+
+    def profile(self, name: str = None) -> Callable[[Callable[P, R]], Callable[P, R]]:
+        def decorator(func: Callable[P, R]) -> Callable[P, R]:
+            spanName = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _ActiveSpan(self, spanName):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def getFrameTrees(self, count: int = None) -> list[dict]:
+        with self._lock:
+            frames = list(self.frames)
+        if count is not None:
+            frames = frames[-count:]
+        return [frame.toDict() for frame in frames]
+
+    def toChromeTrace(self) -> dict:
+        # trace-event format, opens in chrome://tracing and Perfetto
+        pid = os.getpid()
+        events = []
+        with self._lock:
+            pending = list(self.rootSpans)
+        while pending:
+            span = pending.pop()
+            if span.endNs is None:
+                continue
+            events.append(
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": span.startNs / 1000,
+                    "dur": (span.endNs - span.startNs) / 1000,
+                    "pid": pid,
+                    "tid": span.threadId,
+                }
+            )
+            pending.extend(span.children)
+        events.sort(key=lambda event: event["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def exportChromeTrace(self, path: str):
+        with open(path, "w") as file:
+            json.dump(self.toChromeTrace(), file)
+
+    def clear(self):
+        with self._lock:
+            self.rootSpans.clear()
+            self.frames.clear()
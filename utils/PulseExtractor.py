@@ -1,16 +1,31 @@
 from utils.CVUtils import (
     COLOR_CHANNEL_FORMAT_ENUM,
+    COLOR_CHANNEL_FORMAT_GROUPS_ENUM,
     RGB_COLORS_ENUM,
 )
 from utils.CVUtils import CVUtils, MatLike
+from utils.SlidingSpectrum import SlidingSpectrum
+from utils.RingBuffer import RingBuffer
+from utils.BandpassFilter import ButterworthBandpass
+from utils.FrameFeatures import FrameFeatures, FrameFeatureExtractor
 from abc import ABC as AbstractClass
-from collections import deque
+from typing import Any, Callable
+from enum import Enum
 import numpy as np
 import time
 import cv2
 
 
+class RPPG_METHOD_ENUM(Enum):
+    # rows project normalized (R, G, B) onto the two chrominance signals
+    CHROM = ((3.0, -2.0, 0.0), (1.5, 1.0, -1.5))
+    POS = ((0.0, 1.0, -1.0), (-2.0, 1.0, 1.0))
+
+
 class PulseExtractor(AbstractClass):
+    # findPeaks runs a plain Python loop up to this many samples, it is faster there
+    SMALL_SIGNAL_LENGTH: int = 512
+
     def __init__(
         self,
         processingFramerate: float,
@@ -19,11 +34,14 @@ class PulseExtractor(AbstractClass):
         maxImageSize: tuple[int, int],
         frequencyRangeBPM: tuple[float, float],
         bandpassOrder: int,
+        frequencyResolutionBPM: float = 1,
+        samplingCoverage: float = 1,
+        samplingDecimation: int = 1,
     ):
         self.expectedFramesCount: int = int(processingFramerate * targetRecordingWindow)
 
-        self.sampleBuffer: deque[float] = deque(maxlen=self.expectedFramesCount)
-        self.sampleTimeBuffer: deque[float] = deque(maxlen=self.expectedFramesCount)
+        # samples with their capture times
+        self.sampleBuffer = RingBuffer(self.expectedFramesCount)
         self.processingFramerate: float = processingFramerate
         self.targetRecordingWindow: float = targetRecordingWindow
         self.targetClarityThreshold: float = targetClarityThreshold
@@ -41,9 +59,35 @@ class PulseExtractor(AbstractClass):
         self.maxSampleFreq = self.maxHeartRate / 60
         self.minRRIntervalDuration = 60 / self.maxHeartRate
         self.minRRIntervalSamples = (
-            self.minRRIntervalDuration / self.processingFramerate
+            self.minRRIntervalDuration * self.processingFramerate
+        )
+
+        # heart rate band only, updated per sample instead of a full FFT per frame
+        self.frequencyResolutionBPM: float = frequencyResolutionBPM
+        self.spectrum = SlidingSpectrum(
+            self.minSampleFreq, self.maxSampleFreq, frequencyResolutionBPM / 60
         )
 
+        # sampled region: central crop of the frame, or explicit rects such as face ROIs
+        self.samplingCoverage: float = samplingCoverage
+        self.samplingDecimation: int = max(1, int(samplingDecimation))
+        self.samplingRegions: list[tuple[int, int, int, int]] = None
+        self.featureExtractor = FrameFeatureExtractor(self.samplingDecimation)
+        self.lastFeatures: FrameFeatures = None
+
+        # causal bandpass applied as samples arrive, designed for the nominal framerate
+        self.bandpassFilter = ButterworthBandpass(
+            bandpassOrder, processingFramerate, self.minSampleFreq, self.maxSampleFreq
+        )
+        self.filteredBuffer = RingBuffer(self.expectedFramesCount)
+
+        # derived signals are memoized until the samples change
+        self.sampleGeneration: int = 0
+        self._derivedCache: dict = {}
+        self._derivedCacheGeneration: int = 0
+        self.cacheHits: int = 0
+        self.cacheMisses: int = 0
+
     def findPeaks(
         self, signal: np.ndarray, threshold: float = 0.5, min_distance: int = 1
     ):
@@ -58,6 +102,100 @@ class PulseExtractor(AbstractClass):
         Returns:
         - peaks_indices: indices of detected peaks
         """
+        if len(signal) <= PulseExtractor.SMALL_SIGNAL_LENGTH:
+            return PulseExtractor._findPeaksSmall(signal, threshold, min_distance)
+
+        signal = np.asarray(signal)
+        threshold_abs = np.interp(threshold, [0, 1], [np.min(signal), np.max(signal)])
+
+        # strict local maxima above the threshold
+        center = signal[1:-1]
+        candidates = (
+            np.flatnonzero(
+                (center > signal[:-2]) & (center > signal[2:]) & (center >= threshold_abs)
+            )
+            + 1
+        )
+        if len(candidates) < 2:
+            return candidates
+
+        # a candidate at least min_distance after its predecessor always starts a new peak,
+        # so only clusters of close candidates need the sequential suppression
+        startsGroup = np.empty(len(candidates), bool)
+        startsGroup[0] = True
+        startsGroup[1:] = np.diff(candidates) >= min_distance
+        if startsGroup.all():
+            return candidates
+
+        groupStarts = np.flatnonzero(startsGroup)
+        groupEnds = np.append(groupStarts[1:], len(candidates))
+        isCluster = groupEnds - groupStarts > 1
+
+        peaks = [candidates[groupStarts[~isCluster]]]
+        values = signal[candidates]
+        for start, end in zip(
+            groupStarts[isCluster].tolist(), groupEnds[isCluster].tolist()
+        ):
+            peaks.append(
+                PulseExtractor._suppressCluster(
+                    candidates[start:end].tolist(),
+                    values[start:end].tolist(),
+                    min_distance,
+                )
+            )
+
+        return np.sort(np.concatenate(peaks))
+
+    @staticmethod
+    def _findPeaksSmall(
+        signal: np.ndarray, threshold: float, min_distance: float
+    ) -> np.ndarray:
+        # same result as the vectorized path on plain floats, for short signals (such as
+        # the recording window) where the fixed cost of the NumPy calls dominates
+        values = np.asarray(signal, np.float64).tolist()
+        if len(values) < 3:
+            return np.array([], dtype=np.intp)
+        low, high = min(values), max(values)
+        # np.interp semantics: clamped to the range, exact at its ends
+        if threshold <= 0:
+            threshold_abs = low
+        elif threshold >= 1:
+            threshold_abs = high
+        else:
+            threshold_abs = low + (high - low) * threshold
+
+        candidates = [
+            i
+            for i in range(1, len(values) - 1)
+            if values[i - 1] < values[i] > values[i + 1] and values[i] >= threshold_abs
+        ]
+        if not candidates:
+            return np.array([], dtype=np.intp)
+        return PulseExtractor._suppressCluster(
+            candidates, [values[i] for i in candidates], min_distance
+        )
+
+    @staticmethod
+    def _suppressCluster(
+        indices: list[int], values: list[float], min_distance: float
+    ) -> np.ndarray:
+        # keeps the higher of two peaks closer than min_distance, per cluster of candidates
+        peaks = [indices[0]]
+        peakValue = values[0]
+        for i, value in zip(indices[1:], values[1:]):
+            if i - peaks[-1] < min_distance:
+                if value > peakValue:
+                    peaks[-1] = i  # Replace with the higher peak
+                    peakValue = value
+            else:
+                peaks.append(i)
+                peakValue = value
+        return np.array(peaks, dtype=np.intp)
+
+    def _findPeaksLoop(
+        self, signal: np.ndarray, threshold: float = 0.5, min_distance: int = 1
+    ):
+        # reference per-sample implementation, kept to validate findPeaks in benchmarks
         peaks = []
         signal = np.asarray(signal)
         threshold_abs = np.interp(threshold, [0, 1], [np.min(signal), np.max(signal)])
@@ -73,54 +211,148 @@ class PulseExtractor(AbstractClass):
 
         return np.array(peaks)
 
-    def addFrame(self, frame: MatLike, colorFormat: COLOR_CHANNEL_FORMAT_ENUM) -> None:
-        self.sampleTimeBuffer.append(time.time())
-
-        channel = 1  # green
-        hist = CVUtils.calcHists(frame, colorFormat, [channel])[0].reshape((256))
-        centerOfMass = np.sum(np.arange(1, len(hist) + 1) * hist) / np.sum(hist)
-
-        self.sampleBuffer.append(centerOfMass)
+    def addFrame(
+        self,
+        frame: MatLike,
+        colorFormat: COLOR_CHANNEL_FORMAT_ENUM,
+        timestamp: float = None,
+    ) -> None:
+        # timestamp should be the capture time when frames are processed off the UI thread
+        timestamp = time.time() if timestamp is None else timestamp
+
+        self.lastFeatures = self.extractFeatures(frame, colorFormat)
+        sample = self.lastFeatures.channelMeans[1]  # green, same index in RGB and BGR
+        self.addSample(sample, timestamp)
+
+    def addSample(self, sample: float, timestamp: float) -> None:
+        # buffers, streaming filter, spectrum and sampling rate for one new sample
+        evicted = self.sampleBuffer.append(sample, timestamp)
+        self.filteredBuffer.append(self.bandpassFilter.process(sample), timestamp)
+        self.sampleGeneration += 1
+        self.spectrum.addSample(sample, timestamp, *(evicted or (None, None)))
+
+        # mean of consecutive frametimes, straight from the first and last timestamps
+        samplesCount = len(self.sampleBuffer)
+        if samplesCount < 2:
+            return
+        windowSpan = self.sampleBuffer.latestTimestamp - self.sampleBuffer.oldestTimestamp
+        self.averageSamplingRate = windowSpan / (samplesCount - 1)
+        self.averageSamplingFreq = 1 / self.averageSamplingRate
         self.minRRIntervalSamples = (
             self.minRRIntervalDuration / self.averageSamplingRate
         )
-
-        npTimesBuffer = np.array(self.sampleTimeBuffer)
-        frametimes = npTimesBuffer[1:] - npTimesBuffer[:-1]
-        self.averageSamplingRate = np.average(frametimes)
-        self.averageSamplingFreq = 1 / self.averageSamplingRate
-        self.totalRecordingTime = (
-            npTimesBuffer[-1] - npTimesBuffer[0] + self.averageSamplingRate
+        self.totalRecordingTime = windowSpan + self.averageSamplingRate
+
+        # follow the real camera rate once a full window has been measured
+        designFreq = self.bandpassFilter.samplingFrequency
+        if (
+            self.sampleBuffer.isFull()
+            and abs(self.averageSamplingFreq - designFreq) > 0.2 * designFreq
+            and self.averageSamplingFreq > 2 * self.maxSampleFreq
+        ):
+            self.bandpassFilter.design(self.averageSamplingFreq)
+
+    def setSamplingRegions(self, rects: list[tuple[int, int, int, int]] = None):
+        # None goes back to the central crop
+        self.samplingRegions = list(rects) if rects else None
+
+    def extractFeatures(
+        self, frame: MatLike, colorFormat: COLOR_CHANNEL_FORMAT_ENUM
+    ) -> FrameFeatures:
+        # one downscaled pass over the frame feeds both sampling and finger detection
+        return self.featureExtractor.extract(
+            frame, colorFormat, self.samplingRegions, self.samplingCoverage
         )
 
+    def requiresRecording(self):
+        # return self.totalRecordingTime < self.targetRecordingWindow
+        return self.getWindowTime() < self.targetRecordingWindow
+
+    def getWindowTime(self):
+        if not len(self.sampleBuffer):
+            return True
+        window = self.sampleBuffer.timestamps[self.getWindowSlice()]
+        return window[-1] - window[0]
+
     def getPulsePeaks(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
-        raise NotImplementedError()
+        return self._cached("peaks", self._computePulsePeaks)
+
+    def _computePulsePeaks(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        signal = self.getSignal()
+
+        times = np.linspace(0, self.totalRecordingTime, len(signal))
+        peakPositions = self.findPeaks(
+            signal, threshold=0.5, min_distance=self.minRRIntervalSamples
+        )
+        if not len(peakPositions):
+            return np.array([]), np.array([]), np.array([])
+        peakTimes = times[peakPositions]
+        peakAmplitudes = signal[peakPositions]
+
+        return peakPositions, peakTimes, peakAmplitudes
 
     def getBPM(self) -> float:
         raise NotImplementedError()
 
+    def _cached(self, key, compute: Callable[[], Any]) -> Any:
+        if self._derivedCacheGeneration != self.sampleGeneration:
+            self._derivedCache.clear()
+            self._derivedCacheGeneration = self.sampleGeneration
+
+        if key in self._derivedCache:
+            self.cacheHits += 1
+            return self._derivedCache[key]
+
+        self.cacheMisses += 1
+        value = compute()
+        # cached arrays are shared between callers, nobody may write into them
+        for item in value if isinstance(value, tuple) else (value,):
+            if isinstance(item, np.ndarray):
+                item.flags.writeable = False
+        self._derivedCache[key] = value
+        return value
+
+    def getCacheStatistics(self) -> dict:
+        return {
+            "generation": self.sampleGeneration,
+            "hits": self.cacheHits,
+            "misses": self.cacheMisses,
+        }
+
+    def getWindowSlice(self) -> slice:
+        return self._cached("windowSlice", self._computeWindowSlice)
+
+    def _computeWindowSlice(self) -> slice:
+        # samples with time - latest time <= targetRecordingWindow, timestamps are sorted
+        timestamps = self.sampleBuffer.timestamps
+        if not len(timestamps):
+            return slice(0, 0)
+        end = timestamps.searchsorted(
+            timestamps[-1] + self.targetRecordingWindow, side="right"
+        )
+        return slice(0, end)
+
     def getSignal(self, bandpass: bool = False) -> np.ndarray:
+        return self._cached(("signal", bandpass), lambda: self._computeSignal(bandpass))
+
+    def _computeSignal(self, bandpass: bool) -> np.ndarray:
+        samples = self.sampleBuffer.values
         signal = np.interp(
-            self.sampleBuffer,
-            [np.min(self.sampleBuffer), np.max(self.sampleBuffer)],
+            samples,
+            [np.min(samples), np.max(samples)],
             [-1, 1],
         )
         if bandpass:
-            signal = self.bandpass(
-                self.sampleBuffer,
-                self.averageSamplingFreq,
-                self.minSampleFreq,
-                self.maxSampleFreq,
-            )
-        signal = signal[
-            np.where(
-                np.array(self.sampleTimeBuffer) - self.sampleTimeBuffer[-1]
-                <= self.targetRecordingWindow
-            )
-        ]
+            # streaming filter output, copied since the ring keeps being written
+            signal = self.filteredBuffer.values.copy()
+        signal = signal[self.getWindowSlice()]
         return signal
 
-    def getFFT(self, signal) -> tuple[np.ndarray, np.ndarray]:
+    def getFFT(self, signal: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+        # without an explicit signal, the spectrum of getSignal() is memoized
+        if signal is None:
+            return self._cached("fft", lambda: self.getFFT(self.getSignal()))
+
         N = len(signal)
         zero_padding_factor = 10
         padded_length = N * zero_padding_factor
@@ -131,15 +363,29 @@ class PulseExtractor(AbstractClass):
         mask = np.where((freq >= self.minHeartRate) & (freq <= self.maxHeartRate))
         return freq[mask], np.abs(X.real)[mask]
 
-    def getPeakFreq(self, signal) -> float:
+    def getPeakFreq(self, signal: np.ndarray = None) -> float:
         freqs, amps = self.getFFT(signal)
         peakIdx = np.where(amps == np.max(amps))
         return round(freqs[peakIdx][0])
 
-    def plotPulseWave(self, image, color: RGB_COLORS_ENUM):
+    def getPulseWave(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+        # everything needed to draw the pulse wave, safe to hand over to another thread
         signal = self.getSignal()
-        window = self.totalRecordingTime
         _, t, a = self.getPulsePeaks()
+        return signal, t, a, self.totalRecordingTime
+
+    def plotPulseWave(self, image, color: RGB_COLORS_ENUM):
+        PulseExtractor.putPulseWave(image, color, *self.getPulseWave())
+
+    @staticmethod
+    def putPulseWave(
+        image: MatLike,
+        color: RGB_COLORS_ENUM,
+        signal: np.ndarray,
+        t: np.ndarray,
+        a: np.ndarray,
+        window: float,
+    ):
         CVUtils.plotData(
             image,
             signal,
@@ -159,7 +405,7 @@ class PulseExtractor(AbstractClass):
 
     def bandpass(self, signal, fs, f_low, f_high):
         """
-        Bandpass filter using FFT (pure NumPy).
+        Zero-phase Butterworth bandpass of bandpassOrder (pure NumPy), for batch analysis.
 
         Parameters:
         - signal: 1D NumPy array (time domain)
@@ -168,29 +414,30 @@ class PulseExtractor(AbstractClass):
         - f_high: Upper cutoff frequency (Hz)
 
         Returns:
-        - filtered: Real part of the filtered signal (time domain)
+        - filtered: the filtered signal (time domain)
         """
-        n = len(signal)
-        freqs = np.fft.fftfreq(n, d=1 / fs)
-        fft_signal = np.fft.fft(signal)
-
-        # Create mask for bandpass
-        mask = (np.abs(freqs) >= f_low) & (np.abs(freqs) <= f_high)
-        fft_signal[~mask] = 0
+        signal = np.asarray(signal, np.float64)
+        if not (np.isfinite(fs) and 0 < f_low < f_high < fs / 2):
+            # band cannot be represented at this sampling rate, only remove the offset
+            return signal - np.mean(signal) if len(signal) else signal
 
-        filtered = np.fft.ifft(fft_signal)
-        return filtered.real
+        return ButterworthBandpass(self.bandpassOrder, fs, f_low, f_high).filtfilt(
+            signal
+        )
 
     def reset(self):
-        self.sampleTimeBuffer.clear()
         self.sampleBuffer.clear()
+        self.filteredBuffer.clear()
+        self.bandpassFilter.reset()
+        self.spectrum.reset()
+        self.sampleGeneration += 1
         self.pulseSignalAvailable = False
         self.totalRecordingTime = 0
         self.averageSamplingRate = float("inf")
         self.averageSamplingFreq = 0
         self.targetMovement = float("inf")
         self.minRRIntervalSamples = (
-            self.minRRIntervalDuration / self.processingFramerate
+            self.minRRIntervalDuration * self.processingFramerate
         )
 
 
@@ -203,6 +450,11 @@ class PPGPulseExtractor(PulseExtractor):
         maxImageSize,
         frequencyRangeBPM,
         bandpassOrder,
+        frequencyResolutionBPM=1,
+        samplingCoverage=1,
+        samplingDecimation=1,
+        maxDarkFraction=1,
+        maxClippedFraction=0.5,
     ):
         super().__init__(
             processingFramerate,
@@ -211,53 +463,36 @@ class PPGPulseExtractor(PulseExtractor):
             maxImageSize,
             frequencyRangeBPM,
             bandpassOrder,
+            frequencyResolutionBPM,
+            samplingCoverage,
+            samplingDecimation,
         )
+        self.maxDarkFraction: float = maxDarkFraction
+        self.maxClippedFraction: float = maxClippedFraction
         self.hasFinger = False
-        self.hasFingerFlagBuffer: deque[bool] = deque(maxlen=self.expectedFramesCount)
-
-    def detectFinger(self, image: MatLike) -> bool:
-        self.hasFinger = CVUtils.calcSharpness(image) < self.targetClarityThreshold
+        self.hasFingerFlagBuffer = RingBuffer(self.expectedFramesCount, bool)
+
+    def detectFinger(self, features: FrameFeatures) -> bool:
+        # blurry (finger on the lens), lit and not saturated in the sampled green
+        self.hasFinger = (
+            features.sharpness < self.targetClarityThreshold
+            and features.darkFraction <= self.maxDarkFraction
+            and features.greenClippedFraction <= self.maxClippedFraction
+        )
         return self.hasFinger
 
-    def addFrame(self, frame, colorFormat):
-        super().addFrame(frame, colorFormat)
-        self.hasFingerFlagBuffer.append(self.detectFinger(frame))
+    def addFrame(self, frame, colorFormat, timestamp=None):
+        super().addFrame(frame, colorFormat, timestamp)
+        self.hasFingerFlagBuffer.append(
+            self.detectFinger(self.lastFeatures), self.sampleBuffer.latestTimestamp
+        )
         if not self.hasFinger:
             self.reset()
-        self.targetMovement = np.std(self.sampleBuffer)
-        self.pulseSignalAvailable = not self.requiresRecording() and all(
-            self.hasFingerFlagBuffer
+        self.targetMovement = self.sampleBuffer.std()
+        self.pulseSignalAvailable = (
+            not self.requiresRecording() and self.hasFingerFlagBuffer.values.all()
         )
 
-    def requiresRecording(self):
-        # return self.totalRecordingTime < self.targetRecordingWindow
-        return self.getWindowTime() < self.targetRecordingWindow
-
-    def getWindowTime(self):
-        if not self.sampleTimeBuffer:
-            return True
-        window = np.array(self.sampleTimeBuffer)[
-            np.where(
-                np.array(self.sampleTimeBuffer) - self.sampleTimeBuffer[-1]
-                <= self.targetRecordingWindow
-            )
-        ]
-        return window[-1] - window[0]
-
-    def getPulsePeaks(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
-        signal = self.getSignal()
-
-        times = np.linspace(0, self.totalRecordingTime, len(signal))
-        peakPositions = self.findPeaks(
-            signal, threshold=0.5, min_distance=self.minRRIntervalSamples
-        )
-        if not len(peakPositions):
-            return np.array([]), np.array([]), np.array([])
-        peakTimes = times[peakPositions]
-        peakAmplitudes = signal[peakPositions]
-
-        return peakPositions, peakTimes, peakAmplitudes
-
     def getBPM(self) -> float:
         # strategy 1 - average RR-interval
         # _, peakMoments, _ = self.getPulsePeaks()
@@ -270,7 +505,10 @@ class PPGPulseExtractor(PulseExtractor):
         # bpm=((peakPositions[-1]-peakPositions[0])/(len(peakPositions)-1)*60)
 
         # strategy 3 - fft
-        bpm = self.getPeakFreq(self.getSignal())
+        # bpm = self.getPeakFreq(self.getSignal())
+
+        # strategy 4 - sliding spectrum over the heart rate band
+        bpm = self.spectrum.getPeakFrequency() * 60
         return bpm
 
     def reset(self):
@@ -280,6 +518,15 @@ class PPGPulseExtractor(PulseExtractor):
 
 
 class EVMPulseExtractor(PulseExtractor):
+    # Eulerian Video Magnification on the face ROI, streaming.
+    # Every frame the ROI is resized to roiSize and reduced by a Gaussian pyramid, only
+    # the green channel of the coarsest level is kept: a ring of window x level pixels
+    # and a ring of their per-pixel temporal bandpass, each one preallocated block.
+    # From the two rings every pixel gets the share of its variance that lies in the
+    # heart rate band, the pulse sample is the filtered level averaged with weights
+    # growing with that share, so pixels without pulse (hair, background, edges that
+    # move) barely count. Memory and cost per frame do not depend on the camera resolution.
+
     def __init__(
         self,
         processingFramerate,
@@ -287,6 +534,11 @@ class EVMPulseExtractor(PulseExtractor):
         fingerMovementThreshold,
         maxImageSize,
         frequencyRangeBPM,
+        bandpassOrder,
+        frequencyResolutionBPM=1,
+        samplingCoverage=1,
+        pyramidLevels=3,
+        roiSize=(64, 64),
     ):
         super().__init__(
             processingFramerate,
@@ -294,10 +546,260 @@ class EVMPulseExtractor(PulseExtractor):
             fingerMovementThreshold,
             maxImageSize,
             frequencyRangeBPM,
+            bandpassOrder,
+            frequencyResolutionBPM,
+            samplingCoverage,
+        )
+        self.pyramidLevels: int = max(0, int(pyramidLevels))
+        self.roiSize: tuple[int, int] = roiSize
+
+        # (width, height) of every pyramid level, level 0 is the resized ROI
+        self.levelSizes: list[tuple[int, int]] = [roiSize]
+        for _ in range(self.pyramidLevels):
+            width, height = self.levelSizes[-1]
+            self.levelSizes.append(((width + 1) // 2, (height + 1) // 2))
+        width, height = self.levelSizes[-1]
+        self.levelShape: tuple[int, int] = (height, width)
+
+        # every level is written into its own buffer, allocated once per channel count
+        self._levelBuffers: list[np.ndarray] = None
+        self._level = np.empty(self.levelShape, np.float32)
+        self._filteredLevel = np.empty(self.levelShape, np.float32)
+
+        self.levelBuffer = RingBuffer(self.expectedFramesCount, np.float32, self.levelShape)
+        self.filteredLevelBuffer = RingBuffer(
+            self.expectedFramesCount, np.float32, self.levelShape
+        )
+        self.levelFilter = ButterworthBandpass(
+            bandpassOrder, processingFramerate, self.minSampleFreq, self.maxSampleFreq
         )
 
-    def getPulsePeaks(self):
-        raise NotImplementedError()
+        # per-pixel window sums of both rings, updated with every append and eviction
+        self._levelSum = np.zeros(self.levelShape)
+        self._levelSquares = np.zeros(self.levelShape)
+        self._bandSquares = np.zeros(self.levelShape)
+        self.pixelWeights = np.full(self.levelShape, 1 / (width * height))
+
+    def _ensureLevelBuffers(self, channels: int):
+        if self._levelBuffers is not None and self._levelBuffers[0].shape[2] == channels:
+            return
+        self._levelBuffers = [
+            np.empty((height, width, channels), np.uint8)
+            for width, height in self.levelSizes
+        ]
 
-    def getBPM(self):
-        raise NotImplementedError()
+    def getROI(self, frame: MatLike) -> MatLike:
+        # first sampling region (the face), without one the central crop of coverage
+        if self.samplingRegions:
+            x, y, w, h = self.samplingRegions[0]
+            roi = frame[max(0, y) : max(0, y + h), max(0, x) : max(0, x + w)]
+            if roi.size:
+                return roi
+        return CVUtils.cropCenter(frame, self.samplingCoverage)
+
+    def buildPyramidLevel(self, frame: MatLike) -> np.ndarray:
+        # green of the coarsest Gaussian pyramid level of the ROI, float32, reused buffer
+        self._ensureLevelBuffers(frame.shape[2])
+        levels = self._levelBuffers
+        cv2.resize(
+            self.getROI(frame),
+            self.roiSize,
+            dst=levels[0],
+            interpolation=cv2.INTER_AREA,
+        )
+        for i in range(1, len(levels)):
+            cv2.pyrDown(levels[i - 1], dst=levels[i], dstsize=self.levelSizes[i])
+        # green, same index in RGB(A) and BGR(A)
+        np.copyto(self._level, levels[-1][:, :, 1], casting="unsafe")
+        return self._level
+
+    def addFrame(self, frame, colorFormat, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+
+        level = self.buildPyramidLevel(frame)
+        filtered = self.levelFilter.processArray(level, self._filteredLevel)
+        evictedLevel = self.levelBuffer.append(level, timestamp)
+        evictedFiltered = self.filteredLevelBuffer.append(filtered, timestamp)
+
+        self._levelSum += level
+        self._levelSquares += np.square(level, dtype=np.float64)
+        self._bandSquares += np.square(filtered, dtype=np.float64)
+        if evictedLevel is not None:
+            self._levelSum -= evictedLevel[0]
+            self._levelSquares -= np.square(evictedLevel[0], dtype=np.float64)
+            self._bandSquares -= np.square(evictedFiltered[0], dtype=np.float64)
+
+        self.addSample(float((self.updatePixelWeights() * filtered).sum()), timestamp)
+        self.targetMovement = self.sampleBuffer.std()
+        self.pulseSignalAvailable = not self.requiresRecording()
+
+    def updatePixelWeights(self) -> np.ndarray:
+        # squared in-band share of every pixel's window variance, normalized to sum 1
+        count = len(self.levelBuffer)
+        mean = self._levelSum / count
+        variance = self._levelSquares / count - mean * mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.clip(self._bandSquares / count / variance, 0, 1)
+        weights = np.square(np.nan_to_num(share, copy=False), out=self.pixelWeights)
+        total = weights.sum()
+        if total > 0:
+            weights /= total
+        else:
+            weights.fill(1 / weights.size)
+        return weights
+
+    def addSample(self, sample, timestamp):
+        super().addSample(sample, timestamp)
+        # the per-pixel filter follows the real camera rate together with the scalar one
+        if self.levelFilter.samplingFrequency != self.bandpassFilter.samplingFrequency:
+            self.levelFilter.design(self.bandpassFilter.samplingFrequency)
+
+    def getBPM(self) -> float:
+        return self.spectrum.getPeakFrequency() * 60
+
+    def getMemoryUsage(self) -> int:
+        # bytes held per stream, independent of the frame size
+        buffers = sum(buffer.nbytes for buffer in self._levelBuffers or [])
+        sums = self._levelSum.nbytes + self._levelSquares.nbytes + self._bandSquares.nbytes
+        return (
+            self.levelBuffer.nbytes
+            + self.filteredLevelBuffer.nbytes
+            + buffers
+            + sums
+            + self.pixelWeights.nbytes
+            + self._level.nbytes
+            + self._filteredLevel.nbytes
+        )
+
+    def reset(self):
+        super().reset()
+        self.levelBuffer.clear()
+        self.filteredLevelBuffer.clear()
+        self.levelFilter.reset()
+        self._levelSum[:] = 0
+        self._levelSquares[:] = 0
+        self._bandSquares[:] = 0
+
+
+class FacePulseExtractor(PulseExtractor):
+    # Remote PPG from face ROIs (forehead, cheeks) with CHROM or POS.
+    # The RGB mean of all ROIs comes from the frame's integral image (see
+    # CVUtils.calcRegionStatistics), so every ROI costs four lookups. Over a sliding
+    # window of windowSeconds the normalized RGB is projected onto two chrominance
+    # signals, combined as S0 -/+ alpha * S1 and overlap-added. A sample is final once
+    # it leaves the window and only then goes into the sample buffer, filter and
+    # spectrum. The window statistics (channel sums and cross products) are updated
+    # incrementally, one frame costs O(window).
+
+    def __init__(
+        self,
+        processingFramerate,
+        recordingTimeSeconds,
+        faceMovementThreshold,
+        maxImageSize,
+        frequencyRangeBPM,
+        bandpassOrder,
+        frequencyResolutionBPM=1,
+        method: RPPG_METHOD_ENUM = RPPG_METHOD_ENUM.POS,
+        windowSeconds: float = 1.6,
+    ):
+        super().__init__(
+            processingFramerate,
+            recordingTimeSeconds,
+            faceMovementThreshold,
+            maxImageSize,
+            frequencyRangeBPM,
+            bandpassOrder,
+            frequencyResolutionBPM,
+        )
+        self.method: RPPG_METHOD_ENUM = method
+        self.projection = np.array(method.value)
+        # POS adds the second signal, CHROM subtracts it
+        self.projectionSign: float = 1.0 if method == RPPG_METHOD_ENUM.POS else -1.0
+        self.windowLength: int = max(2, int(round(windowSeconds * processingFramerate)))
+        self.hasFace = False
+        self.lastRGB: np.ndarray = None
+
+        self.rgbBuffer = RingBuffer(self.windowLength, np.float64, (3,))
+        self._overlap = np.zeros(self.windowLength)
+        self._rgbSum = np.zeros(3)
+        self._rgbProducts = np.zeros((3, 3))
+
+    def sampleRegions(
+        self,
+        frame: MatLike,
+        colorFormat: COLOR_CHANNEL_FORMAT_ENUM,
+        rects: list[tuple[int, int, int, int]],
+        streamId=None,
+        sequence: int = None,
+    ) -> np.ndarray:
+        # pixel weighted (R, G, B) mean of all rects, None when none lies in the frame
+        means, _, areas = CVUtils.calcRegionStatistics(frame, rects, streamId, sequence)
+        totalArea = areas.sum()
+        if not totalArea:
+            return None
+        valid = areas > 0
+        means = (means[valid, :3] * areas[valid, None]).sum(axis=0) / totalArea
+
+        if colorFormat in COLOR_CHANNEL_FORMAT_GROUPS_ENUM.RGB_TYPE.value:
+            return means
+        return means[::-1]
+
+    def addFrame(self, frame, colorFormat, timestamp=None, streamId=None, sequence=None):
+        # with a streamId and frame sequence the integral image is shared per frame
+        timestamp = time.time() if timestamp is None else timestamp
+
+        rgb = None
+        if self.samplingRegions:
+            rgb = self.sampleRegions(
+                frame, colorFormat, self.samplingRegions, streamId, sequence
+            )
+        self.hasFace = rgb is not None and bool(np.all(rgb > 0))
+        if not self.hasFace:
+            self.reset()
+            return
+        self.lastRGB = rgb
+
+        evicted = self.rgbBuffer.append(rgb, timestamp)
+        self._rgbSum += rgb
+        self._rgbProducts += np.outer(rgb, rgb)
+        if evicted is not None:
+            self._rgbSum -= evicted[0]
+            self._rgbProducts -= np.outer(evicted[0], evicted[0])
+
+        if self.rgbBuffer.isFull():
+            self._overlap += self._projectWindow()
+            # the oldest sample of the window got its last contribution
+            self.addSample(self._overlap[0], self.rgbBuffer.oldestTimestamp)
+            self._overlap[:-1] = self._overlap[1:]
+            self._overlap[-1] = 0
+
+        self.targetMovement = self.sampleBuffer.std() if len(self.sampleBuffer) else 0
+        self.pulseSignalAvailable = len(self.sampleBuffer) > 1 and not self.requiresRecording()
+
+    def _projectWindow(self) -> np.ndarray:
+        # pulse signal of the current window, zero mean
+        length = self.windowLength
+        mean = self._rgbSum / length
+        covariance = self._rgbProducts / length - np.outer(mean, mean)
+        # window statistics of the temporally normalized RGB (each channel / its mean)
+        normalizedCovariance = covariance / np.outer(mean, mean)
+        variances = np.einsum(
+            "ij,jk,ik->i", self.projection, normalizedCovariance, self.projection
+        )
+        alpha = np.sqrt(max(variances[0], 0) / variances[1]) if variances[1] > 0 else 0
+        weights = self.projection[0] + self.projectionSign * alpha * self.projection[1]
+
+        # normalized RGB has mean one per channel, so the signal mean is weights.sum()
+        signal = self.rgbBuffer.values @ (weights / mean)
+        return signal - weights.sum()
+
+    def getBPM(self) -> float:
+        return self.spectrum.getPeakFrequency() * 60
+
+    def reset(self):
+        super().reset()
+        self.rgbBuffer.clear()
+        self._overlap[:] = 0
+        self._rgbSum[:] = 0
+        self._rgbProducts[:] = 0
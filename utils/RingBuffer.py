@@ -0,0 +1,82 @@
+import numpy as np
+
+
+class RingBuffer:
+    # Fixed-capacity buffer of values with their timestamps, backed by preallocated arrays.
+    # Every sample is written twice, at slot i and i + capacity, so the stored samples
+    # are always one contiguous slice: values and timestamps are views, never copies.
+    # With a shape every value is an array of that shape (e.g. one image per slot).
+
+    def __init__(self, capacity: int, dtype: np.dtype = np.float64, shape: tuple = ()):
+        self.capacity: int = max(1, int(capacity))
+        self.shape: tuple = tuple(shape)
+        self._values = np.zeros((2 * self.capacity,) + self.shape, dtype)
+        self._timestamps = np.zeros(2 * self.capacity, np.float64)
+        self._start: int = 0
+        self._length: int = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def isFull(self) -> bool:
+        return self._length == self.capacity
+
+    def append(self, value, timestamp: float) -> tuple | None:
+        # returns the evicted (value, timestamp) pair once the buffer is full
+        evicted = None
+        if self._length == self.capacity:
+            oldest = self._values[self._start]
+            evicted = (
+                oldest.copy() if self.shape else oldest.item(),
+                self._timestamps[self._start].item(),
+            )
+
+        writeIndex = (self._start + self._length) % self.capacity
+        self._values[writeIndex] = value
+        self._values[writeIndex + self.capacity] = value
+        self._timestamps[writeIndex] = timestamp
+        self._timestamps[writeIndex + self.capacity] = timestamp
+
+        if self._length < self.capacity:
+            self._length += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+        return evicted
+
+    @property
+    def values(self) -> np.ndarray:
+        # oldest first, view into the buffer, valid until the next append
+        return self._values[self._start : self._start + self._length]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps[self._start : self._start + self._length]
+
+    @property
+    def oldestTimestamp(self) -> float:
+        return self._timestamps[self._start].item()
+
+    @property
+    def latestTimestamp(self) -> float:
+        return self._timestamps[self._start + self._length - 1].item()
+
+    @property
+    def latestValue(self):
+        latest = self._values[self._start + self._length - 1]
+        return latest if self.shape else latest.item()
+
+    @property
+    def nbytes(self) -> int:
+        return self._values.nbytes + self._timestamps.nbytes
+
+    def std(self) -> float:
+        # standard deviation without temporary arrays
+        if not self._length:
+            return float("nan")
+        values = self.values
+        mean = values.sum() / self._length
+        return float(np.sqrt(max(0.0, values.dot(values) / self._length - mean * mean)))
+
+    def clear(self):
+        self._start = 0
+        self._length = 0
@@ -4,16 +4,59 @@ from utils.CVUtils import (
     HAARCASCADE_ENUM as HAARCASCADES,
     FRAMERATE_ENUM as FPS,
 )
+from utils.PulseExtractor import RPPG_METHOD_ENUM as RPPG_METHOD
 
 
 class SettingsManager:
     RECODRING_IMAGE_SIZE: RESOLUTION_ENUM = RESOLUTION.LOW
     PROCESSING_IMAGE_SIZE: RESOLUTION = RESOLUTION.LOWEST
     HAARCASCADE_FACE_EXTRACTOR: HAARCASCADES = HAARCASCADES.FRONTALFACE_DEFAULT
+    # follow detected faces by template matching, full cascade pass every N frames
+    FACE_TRACKING_ENABLED: bool = True
+    FACE_REDETECTION_INTERVAL: int = 10
+    FACE_TRACKING_THRESHOLD: float = 0.6
+    # re-detections search near tracked faces, padded by this fraction of their size
+    FACE_SEARCH_MARGIN: float = 0.5
+    FACE_SEARCH_SCALE_TOLERANCE: float = 0.3
+    FACE_FULL_SCAN_INTERVAL: int = 3
+    # threads the cascade runs of one batch (one frame per camera) are spread over
+    FACE_DETECTION_WORKERS: int = 2
     PREVIEW_FRAMERATE: FPS = FPS.LOW
+    # upload native camera frames and let the Image widget scale them on the GPU
+    PREVIEW_GPU_SCALING: bool = True
+    HISTOGRAM_SUBSAMPLING: int = 4
+    # preview frames between two rebuilds of the histogram overlay
+    HISTOGRAM_OVERLAY_DIVIDER: int = 4
     PROCESSING_FRAMERATE: FPS = FPS.LOW
-    PPG_TARGET_CLARITY_THRESHOLD: float = 6
+    CAMERA_THREADED_CAPTURE: bool = True
+    CAMERA_FRAME_RING_SIZE: int = 2
+    PROCESSING_WORKERS: int = 2
+    PROFILING_ENABLED: bool = False
+    PROFILING_TRACE_PATH: str = "profile_trace.json"
+    # pre-decoded icons, written by python -m utils.AssetManager, used when present
+    ICON_CACHE_PATH: str = "assets/images/icons.npz"
+    # Laplacian stddev of a 320 px wide grey downscale, below it the lens is covered
+    PPG_TARGET_CLARITY_THRESHOLD: float = 8
+    # a finger frame is rejected above these fractions of dark or green-saturated pixels,
+    # neither carries a pulse. The torch is never turned on, so a finger lit by ambient
+    # light alone is mostly dark and the dark check is off (1) by default
+    PPG_MAX_DARK_FRACTION: float = 1
+    PPG_MAX_CLIPPED_FRACTION: float = 0.5
     MIN_HEARTRATE_BPM: float = 50
     MAX_HEARTRATE_BPM: float = 120
     PPG_BANDPASS_ORDER: int = 3
+    BPM_FREQUENCY_RESOLUTION: float = 1
+    PPG_SAMPLING_COVERAGE: float = 0.5
+    PPG_SAMPLING_DECIMATION: int = 2
     RECORDING_TIME_SECONDS: float = 60 / MIN_HEARTRATE_BPM * 2
+    # face ROI is resized to EVM_ROI_SIZE, only the coarsest pyramid level is recorded
+    EVM_ROI_SIZE: tuple[int, int] = (64, 64)
+    EVM_PYRAMID_LEVELS: int = 3
+    # remote PPG from the forehead and cheek ROIs of the front camera
+    FACE_PULSE_METHOD: RPPG_METHOD = RPPG_METHOD.POS
+    FACE_PULSE_WINDOW_SECONDS: float = 1.6
+    # faces of consecutive detections with at least this IoU are the same subject
+    SUBJECT_MATCH_THRESHOLD: float = 0.3
+    # detections a subject may be missing from before its pulse state is dropped
+    SUBJECT_MAX_MISSED_UPDATES: int = 10
+    MAX_SUBJECTS: int = 6
@@ -0,0 +1,92 @@
+import numpy as np
+
+
+class SlidingSpectrum:
+    # Sliding DFT evaluated only at a fixed bank of frequencies.
+    # Samples carry their own timestamps, so irregular frame times are handled exactly.
+    # Adding or evicting a sample costs O(bins), the mean is removed when reading
+    # the magnitudes so the DC level of the signal does not leak into the low bins.
+
+    def __init__(self, minFrequency: float, maxFrequency: float, resolution: float):
+        # frequencies in Hz, resolution is the spacing between evaluated bins
+        self.frequencies = np.arange(
+            minFrequency, maxFrequency + resolution / 2, resolution
+        )
+        self.angularFrequencies = 2 * np.pi * self.frequencies
+
+        binsCount = len(self.frequencies)
+        self.sampleSumReal = np.zeros(binsCount)
+        self.sampleSumImag = np.zeros(binsCount)
+        self.basisSumReal = np.zeros(binsCount)
+        self.basisSumImag = np.zeros(binsCount)
+        self.valueSum: float = 0
+        self.count: int = 0
+        self.referenceTime: float = None
+
+        # scratch space so updates do not allocate
+        self._phase = np.empty(binsCount)
+        self._cos = np.empty(binsCount)
+        self._sin = np.empty(binsCount)
+        self._magnitudes = np.empty(binsCount)
+        self._scratch = np.empty(binsCount)
+
+    def _accumulate(self, value: float, timestamp: float, sign: float):
+        np.multiply(self.angularFrequencies, timestamp - self.referenceTime, out=self._phase)
+        np.cos(self._phase, out=self._cos)
+        np.sin(self._phase, out=self._sin)
+        self._cos *= sign
+        self._sin *= sign
+
+        # e^(-jwt) = cos(wt) - j sin(wt)
+        self.basisSumReal += self._cos
+        self.basisSumImag -= self._sin
+        np.multiply(self._cos, value, out=self._scratch)
+        self.sampleSumReal += self._scratch
+        np.multiply(self._sin, value, out=self._scratch)
+        self.sampleSumImag -= self._scratch
+        self.valueSum += sign * value
+        self.count += int(sign)
+
+    def addSample(
+        self,
+        value: float,
+        timestamp: float,
+        evictedValue: float = None,
+        evictedTimestamp: float = None,
+    ):
+        if self.referenceTime is None:
+            # keep phases small, absolute epoch times would cost precision
+            self.referenceTime = timestamp
+
+        if evictedValue is not None:
+            self._accumulate(evictedValue, evictedTimestamp, -1)
+        self._accumulate(value, timestamp, 1)
+
+    def getMagnitudes(self) -> np.ndarray:
+        # spectrum of (signal - mean) at every bin
+        if not self.count:
+            self._magnitudes[:] = 0
+            return self._magnitudes
+
+        mean = self.valueSum / self.count
+        np.multiply(self.basisSumReal, mean, out=self._scratch)
+        np.subtract(self.sampleSumReal, self._scratch, out=self._scratch)
+        np.square(self._scratch, out=self._magnitudes)
+        np.multiply(self.basisSumImag, mean, out=self._scratch)
+        np.subtract(self.sampleSumImag, self._scratch, out=self._scratch)
+        np.square(self._scratch, out=self._scratch)
+        self._magnitudes += self._scratch
+        np.sqrt(self._magnitudes, out=self._magnitudes)
+        return self._magnitudes
+
+    def getPeakFrequency(self) -> float:
+        return self.frequencies[np.argmax(self.getMagnitudes())]
+
+    def reset(self):
+        self.sampleSumReal[:] = 0
+        self.sampleSumImag[:] = 0
+        self.basisSumReal[:] = 0
+        self.basisSumImag[:] = 0
+        self.valueSum = 0
+        self.count = 0
+        self.referenceTime = None
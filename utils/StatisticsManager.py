@@ -1,13 +1,83 @@
 import time
 from typing import TypeVar, Callable, ParamSpec
-import numpy as np
 from collections import deque 
+from utils.Profiler import Profiler
 
 P = ParamSpec("P")
 R = TypeVar("R")
 
 
+class P2Quantile:
+    # Streaming quantile estimate with the P-square algorithm (Jain & Chlamtac):
+    # five markers, O(1) memory and time per value, no samples are stored.
+
+    def __init__(self, quantile: float):
+        self.quantile = quantile
+        self.heights: list[float] = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desiredPositions = [
+            1,
+            1 + 2 * quantile,
+            1 + 4 * quantile,
+            3 + 2 * quantile,
+            5,
+        ]
+        self.increments = [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+
+    def add(self, value: float):
+        q = self.heights
+        if len(q) < 5:
+            q.append(value)
+            q.sort()
+            return
+
+        n = self.positions
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desiredPositions[i] += self.increments[i]
+
+        # move the middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self.desiredPositions[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if q[i - 1] < parabolic < q[i + 1]:
+                    q[i] = parabolic
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    @property
+    def value(self) -> float:
+        q = self.heights
+        if not q:
+            return None
+        if len(q) < 5:
+            # exact while the markers are not initialized yet
+            return q[min(len(q) - 1, int(round(self.quantile * (len(q) - 1))))]
+        return q[2]
+
+
 class Statistic:
+    # Every update is O(1): windowed sum and variance are updated with a sliding Welford
+    # step, window min/max come from monotonic deques, all-time quantiles from P-square.
+
     def __init__(self, bufferMaxLength: int = 32):
         self.buffer = deque(maxlen=bufferMaxLength)
         self.bufferMaxLength = bufferMaxLength
@@ -18,26 +88,84 @@ class Statistic:
         self.absoluteMaximum = None
         self.average = None
         self.absoluteAverage = None
+        self.variance = None
+        self.absoluteVariance = None
+        self.p50 = None
+        self.p95 = None
+        self.p99 = None
         self.count = 0
 
+        # (index, value) pairs, increasing values for the minimum, decreasing for the maximum
+        self._minimumCandidates: deque[tuple[int, float]] = deque()
+        self._maximumCandidates: deque[tuple[int, float]] = deque()
+        self._windowSquaredDeviations = 0.0
+        self._absoluteSquaredDeviations = 0.0
+        self._quantiles = (P2Quantile(0.5), P2Quantile(0.95), P2Quantile(0.99))
+
     def newValue(self, value: float):
+        evicted = self.buffer[0] if len(self.buffer) == self.bufferMaxLength else None
         self.buffer.append(value)
-
+        index = self.count
         self.lastValue = value
-        self.minimum = np.min(self.buffer) or self.lastValue
-        self.maximum = np.max(self.buffer) or self.lastValue
-        self.average = np.average(self.buffer) or self.lastValue
-        self.absoluteMaximum = max(self.absoluteMaximum or self.lastValue, self.lastValue)
-        self.absoluteMinimum = max(self.absoluteMinimum or self.lastValue, self.lastValue)
-        self.absoluteAverage = (
-            (self.absoluteAverage or self.lastValue) * self.count + value
-        ) / (self.count + 1)
+
+        # windowed mean and variance
+        if self.average is None:
+            self.average = value
+            self._windowSquaredDeviations = 0.0
+        elif evicted is None:
+            delta = value - self.average
+            self.average += delta / len(self.buffer)
+            self._windowSquaredDeviations += delta * (value - self.average)
+        else:
+            previousAverage = self.average
+            self.average += (value - evicted) / len(self.buffer)
+            self._windowSquaredDeviations += (value - evicted) * (
+                value - self.average + evicted - previousAverage
+            )
+        if (index + 1) % (self.bufferMaxLength * 64) == 0:
+            # occasional exact recompute keeps rounding drift bounded, amortized O(1)
+            self.average = sum(self.buffer) / len(self.buffer)
+            self._windowSquaredDeviations = sum(
+                (item - self.average) ** 2 for item in self.buffer
+            )
+        self.variance = max(0.0, self._windowSquaredDeviations) / len(self.buffer)
+
+        # windowed min/max
+        while self._minimumCandidates and self._minimumCandidates[-1][1] >= value:
+            self._minimumCandidates.pop()
+        self._minimumCandidates.append((index, value))
+        if self._minimumCandidates[0][0] <= index - self.bufferMaxLength:
+            self._minimumCandidates.popleft()
+        while self._maximumCandidates and self._maximumCandidates[-1][1] <= value:
+            self._maximumCandidates.pop()
+        self._maximumCandidates.append((index, value))
+        if self._maximumCandidates[0][0] <= index - self.bufferMaxLength:
+            self._maximumCandidates.popleft()
+        self.minimum = self._minimumCandidates[0][1]
+        self.maximum = self._maximumCandidates[0][1]
+
+        # all-time values, Welford for the variance
+        if self.count == 0:
+            self.absoluteMinimum = value
+            self.absoluteMaximum = value
+            self.absoluteAverage = value
+        else:
+            self.absoluteMinimum = min(self.absoluteMinimum, value)
+            self.absoluteMaximum = max(self.absoluteMaximum, value)
+            delta = value - self.absoluteAverage
+            self.absoluteAverage += delta / (self.count + 1)
+            self._absoluteSquaredDeviations += delta * (value - self.absoluteAverage)
         self.count += 1
+        self.absoluteVariance = self._absoluteSquaredDeviations / self.count
+
+        for quantile in self._quantiles:
+            quantile.add(value)
+        self.p50, self.p95, self.p99 = (quantile.value for quantile in self._quantiles)
 
     def run(self, func: Callable[P, R], *args: P.args, **kwargs: P.kwargs) -> R:
-        startTime = time.time()
+        startTime = time.perf_counter_ns()
         returnValue = func(*args, **kwargs)
-        self.newValue(time.time() - startTime)
+        self.newValue((time.perf_counter_ns() - startTime) / 1e9)
         return returnValue
 
     def log(self):
@@ -45,16 +173,21 @@ class Statistic:
         print(f"Minimum: {self.minimum}")
         print(f"Maximum: {self.maximum}")
         print(f"Average: {self.average}")
+        print(f"Variance: {self.variance}")
         print(f"All time average: {self.absoluteAverage}")
         print(f"All time minimum: {self.absoluteMinimum}")
         print(f"All time maximum: {self.absoluteMaximum}")
+        print(f"All time variance: {self.absoluteVariance}")
+        print(f"All time p50/p95/p99: {self.p50}/{self.p95}/{self.p99}")
         print(f"Buffer: {len(self.buffer)}/{self.bufferMaxLength}")
 
 
 class StatisticsManager:
-    def __init__(self, bufferMaxLength: int = 32):
+    def __init__(self, bufferMaxLength: int = 32, profiler: Profiler = None):
         self.statistics: dict[str, Statistic] = {}
         self.bufferMaxLength = bufferMaxLength
+        # timed calls also show up as spans when a profiler is attached
+        self.profiler = profiler or Profiler(enabled=False)
 
     def _ensureKey(self, key,maxLen:int=None):
         if not key in self.statistics:
@@ -67,12 +200,9 @@ class StatisticsManager:
     def run(
         self, key: str, func: Callable[P, R], *args: P.args, **kwargs: P.kwargs,
     ) -> R:
-        # TODO: use timeit
         self._ensureKey(key)
-        if not key in self.statistics:
-            self.statistics[key] = Statistic(self.bufferMaxLength)
-
-        return self.statistics[key].run(func, *args, **kwargs)
+        with self.profiler.span(key):
+            return self.statistics[key].run(func, *args, **kwargs)
     
     def log(self, key:str):
         if key in self.statistics:
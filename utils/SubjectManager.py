@@ -0,0 +1,129 @@
+from utils.CVUtils import COLOR_CHANNEL_FORMAT_ENUM, CVUtils, MatLike
+from utils.PulseExtractor import FacePulseExtractor
+from utils.FaceDetector import FaceDetector
+from typing import Callable
+import numpy as np
+
+
+class Subject:
+    __slots__ = ("subjectId", "boundingBox", "pulseExtractor", "missedUpdates")
+
+    def __init__(
+        self,
+        subjectId: int,
+        boundingBox: tuple[int, int, int, int],
+        pulseExtractor: FacePulseExtractor,
+    ):
+        self.subjectId = subjectId
+        self.boundingBox = boundingBox
+        self.pulseExtractor = pulseExtractor
+        self.missedUpdates: int = 0
+
+    def getState(self) -> dict:
+        # plain values, safe to hand over to another thread
+        extractor = self.pulseExtractor
+        pulseSignalAvailable = extractor.pulseSignalAvailable
+        return {
+            "subjectId": self.subjectId,
+            "boundingBox": self.boundingBox,
+            "visible": not self.missedUpdates,
+            "pulseSignalAvailable": pulseSignalAvailable,
+            "bpm": extractor.getBPM() if pulseSignalAvailable else None,
+            "pulseWave": extractor.getPulseWave() if pulseSignalAvailable else None,
+        }
+
+
+class SubjectManager:
+    # Stable ids for the faces of one camera and a pulse extractor per subject.
+    # Every update matches the new face boxes to the known subjects by IoU (greedy,
+    # best pairs first), unmatched boxes become new subjects up to maxSubjects and
+    # subjects missing for more than maxMissedUpdates updates are dropped with their
+    # state. Extractor buffers are fixed-size ring buffers, so memory is bounded by
+    # maxSubjects and the cost of a frame grows linearly with the number of faces.
+
+    def __init__(
+        self,
+        createPulseExtractor: Callable[[], FacePulseExtractor],
+        matchThreshold: float = 0.3,
+        maxMissedUpdates: int = 10,
+        maxSubjects: int = 6,
+    ):
+        self.createPulseExtractor = createPulseExtractor
+        self.matchThreshold: float = matchThreshold
+        self.maxMissedUpdates: int = maxMissedUpdates
+        self.maxSubjects: int = maxSubjects
+        self.subjects: dict[int, Subject] = {}
+        self.nextSubjectId: int = 1
+        self.evictedCount: int = 0
+
+    def update(self, boundingBoxes: list[tuple[int, int, int, int]]) -> list[Subject]:
+        # returns the subjects seen in this update, in the order of boundingBoxes
+        subjects = list(self.subjects.values())
+        matches: dict[int, Subject] = {}
+        if subjects and boundingBoxes:
+            overlaps = CVUtils.calcIntersectionOverUnion(
+                [subject.boundingBox for subject in subjects], boundingBoxes
+            )
+            matchedSubjects = set()
+            for index in np.argsort(overlaps, axis=None)[::-1].tolist():
+                subjectIndex, boxIndex = divmod(index, len(boundingBoxes))
+                if overlaps[subjectIndex, boxIndex] < self.matchThreshold:
+                    break
+                if subjectIndex in matchedSubjects or boxIndex in matches:
+                    continue
+                matchedSubjects.add(subjectIndex)
+                matches[boxIndex] = subjects[subjectIndex]
+
+        # unmatched subjects miss this update, the ones gone too long make room
+        matchedIds = {subject.subjectId for subject in matches.values()}
+        for subject in subjects:
+            if subject.subjectId in matchedIds:
+                continue
+            subject.missedUpdates += 1
+            if subject.missedUpdates > self.maxMissedUpdates:
+                del self.subjects[subject.subjectId]
+                self.evictedCount += 1
+
+        seen = []
+        for boxIndex, boundingBox in enumerate(boundingBoxes):
+            subject = matches.get(boxIndex)
+            if subject is None:
+                if len(self.subjects) >= self.maxSubjects:
+                    continue
+                subject = Subject(
+                    self.nextSubjectId, boundingBox, self.createPulseExtractor()
+                )
+                self.subjects[subject.subjectId] = subject
+                self.nextSubjectId += 1
+            subject.boundingBox = tuple(boundingBox)
+            subject.missedUpdates = 0
+            seen.append(subject)
+        return seen
+
+    def addFrame(
+        self,
+        frame: MatLike,
+        colorFormat: COLOR_CHANNEL_FORMAT_ENUM,
+        boundingBoxes: list[tuple[int, int, int, int]],
+        timestamp: float = None,
+        streamId=None,
+        sequence: int = None,
+    ) -> list[dict]:
+        # samples the forehead and cheeks of every visible subject, missing subjects keep
+        # their state untouched until they are matched again or evicted
+        for subject in self.update(boundingBoxes):
+            extractor = subject.pulseExtractor
+            extractor.setSamplingRegions(
+                [
+                    FaceDetector.extractForeheadBoundingBox(subject.boundingBox),
+                    FaceDetector.extractCheekBoundingBox(subject.boundingBox),
+                ]
+            )
+            extractor.addFrame(frame, colorFormat, timestamp, streamId, sequence)
+        return self.getStates()
+
+    def getStates(self) -> list[dict]:
+        return [subject.getState() for subject in self.subjects.values()]
+
+    def reset(self):
+        self.subjects.clear()
@@ -0,0 +1,81 @@
+from utils.CVUtils import COLOR_CHANNEL_FORMAT_ENUM, CVUtils, MatLike
+from utils.StatisticsManager import StatisticsManager
+from kivy.graphics.texture import Texture
+import numpy as np
+
+
+class TexturePool:
+    # Textures and conversion buffers per owner (usually an Image canvas), keyed by
+    # (width, height, colorfmt). Frames of an unchanged size are blitted into the pooled
+    # texture in place, a new size or format (window or camera resolution change) evicts
+    # the owner's old entries. Allocation counts are reported to the StatisticsManager.
+
+    def __init__(self, statisticsManager: StatisticsManager = None):
+        self.statisticsManager = statisticsManager
+        self.textures: dict[object, dict[tuple, Texture]] = {}
+        self.buffers: dict[object, dict[tuple, MatLike]] = {}
+        self.textureAllocations: int = 0
+        self.bufferAllocations: int = 0
+        self.evictions: int = 0
+
+    def _report(self, key: str, value: int):
+        if self.statisticsManager is not None:
+            self.statisticsManager.addValue(key, value)
+
+    def getTexture(
+        self, owner, size: tuple[int, int], colorFormat: COLOR_CHANNEL_FORMAT_ENUM
+    ) -> Texture:
+        key = (size[0], size[1], colorFormat.value)
+        ownerTextures = self.textures.setdefault(owner, {})
+        texture = ownerTextures.get(key)
+        if texture is None:
+            if ownerTextures:
+                self.evict(owner)
+                ownerTextures = self.textures.setdefault(owner, {})
+            texture = ownerTextures[key] = CVUtils.createTexture(size, colorFormat)
+            self.textureAllocations += 1
+            self._report("textureAllocations", self.textureAllocations)
+        return texture
+
+    def getBuffer(self, owner, shape: tuple, dtype: np.dtype = np.uint8) -> MatLike:
+        key = (shape, np.dtype(dtype).str)
+        ownerBuffers = self.buffers.setdefault(owner, {})
+        buffer = ownerBuffers.get(key)
+        if buffer is None:
+            # only the latest shape is kept, older ones belong to a previous resolution
+            ownerBuffers.clear()
+            buffer = ownerBuffers[key] = np.empty(shape, dtype)
+            self.bufferAllocations += 1
+            self._report("textureBufferAllocations", self.bufferAllocations)
+        return buffer
+
+    def upload(
+        self,
+        owner,
+        cvImage: MatLike,
+        inputChannelFormat: COLOR_CHANNEL_FORMAT_ENUM = COLOR_CHANNEL_FORMAT_ENUM.BGR_AUTO_ALPHA,
+    ) -> Texture:
+        # blits the image into the owner's pooled texture and returns it
+        uploadFormat = CVUtils.getUploadFormat(cvImage, inputChannelFormat)
+        # texture first, a new size evicts the owner's old buffers as well
+        texture = self.getTexture(
+            owner, (cvImage.shape[1], cvImage.shape[0]), uploadFormat
+        )
+        buffer = None
+        if CVUtils.resolveChannelFormat(cvImage, inputChannelFormat) != uploadFormat:
+            buffer = self.getBuffer(
+                owner, CVUtils.getConvertedShape(cvImage, uploadFormat)
+            )
+        return CVUtils.cvImageToKivyTexture(
+            cvImage, inputChannelFormat, uploadFormat, texture, buffer
+        )
+
+    def evict(self, owner=None):
+        # drops the entries of one owner, or of every owner
+        owners = list(self.textures) if owner is None else [owner]
+        for key in owners:
+            evicted = self.textures.pop(key, None)
+            self.buffers.pop(key, None)
+            if evicted:
+                self.evictions += len(evicted)
+                self._report("textureEvictions", self.evictions)